@@ -0,0 +1,184 @@
+from pathlib import Path
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import shapely
+from geometry_cache import default_cache_path, file_sha256, load_continental, source_key, source_unchanged
+from export import read_all_data
+
+CONTIGUITY = ('queen', 'rook')
+
+class Adjacency:
+    """
+    Symmetric 0/1 contiguity matrix (scipy CSR, float32) between the counties in geoids order.
+    Every neighborhood operation below is one sparse product over all variables at once.
+    """
+    def __init__(self, geoids, matrix):
+        self.geoids = pd.Index(np.asarray(geoids))
+        self.matrix = sp.csr_matrix(matrix, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.geoids)
+
+    def degree(self):
+        return np.asarray(self.matrix.sum(axis=1)).ravel().astype(np.int32)
+
+    def align(self, geoids):
+        """
+        The graph over geoids, in that order. GEOIDs the graph does not know have no neighbors.
+        """
+        positions = self.geoids.get_indexer(np.asarray(geoids))
+        known = positions >= 0
+        select = sp.csr_matrix((np.ones(known.sum(), dtype=np.float32), (np.flatnonzero(known), positions[known])),
+                               shape=(len(positions), len(self.geoids)))
+        return Adjacency(geoids, select @ self.matrix @ select.T)
+
+def build_adjacency(geometry, contiguity='queen', tolerance=0.):
+    """
+    Sparse contiguity of polygons from one STRtree query. Queen neighbors share at least a point
+    (or lie within tolerance meters, for boundaries that do not quite meet); rook neighbors
+    share a stretch of border longer than 2 * tolerance.
+    """
+    if contiguity not in CONTIGUITY:
+        raise ValueError("contiguity must be 'queen' or 'rook', got " + repr(contiguity))
+    geometry = np.asarray(geometry)
+    tree = shapely.STRtree(geometry)
+    if tolerance > 0:
+        left, right = tree.query(geometry, predicate='dwithin', distance=tolerance)
+    else:
+        left, right = tree.query(geometry, predicate='intersects')
+    pair = left < right
+    left, right = left[pair], right[pair]
+    if contiguity == 'rook':
+        other = shapely.buffer(geometry[right], tolerance) if tolerance > 0 else geometry[right]
+        shared = shapely.length(shapely.intersection(shapely.boundary(geometry[left]), other))
+        left, right = left[shared > 2 * tolerance], right[shared > 2 * tolerance]
+    n = len(geometry)
+    ones = np.ones(2 * len(left), dtype=np.float32)
+    return sp.csr_matrix((ones, (np.concatenate([left, right]), np.concatenate([right, left]))), shape=(n, n))
+
+def default_adjacency_path(continental_path, contiguity, tolerance=0.):
+    cache_path = default_cache_path(continental_path)
+    return cache_path.with_name(f"{cache_path.stem}_{contiguity}_{float(tolerance):g}m.npz")
+
+def load_adjacency(continental_path, contiguity='queen', tolerance=0., cache_path=None):
+    """
+    The Adjacency of continental_path's polygons, built once and kept next to the geometry cache
+    until continental.csv, the contiguity or the tolerance changes.
+    """
+    cache_path = Path(cache_path) if cache_path else default_adjacency_path(continental_path, contiguity, tolerance)
+    if cache_path.exists():
+        cached = np.load(cache_path)
+        if ({'size', 'mtime_ns', 'sha256', 'contiguity', 'tolerance'} <= set(cached.files)
+                and str(cached['contiguity']) == contiguity and float(cached['tolerance']) == float(tolerance)):
+            key = {name: cached[name].item() for name in ('size', 'mtime_ns', 'sha256')}
+            if source_unchanged(continental_path, key, cache_path):
+                matrix = sp.csr_matrix((np.ones(len(cached['indices']), dtype=np.float32), cached['indices'], cached['indptr']),
+                                       shape=(len(cached['geoids']),) * 2)
+                return Adjacency(cached['geoids'], matrix)
+
+    print("Building adjacency " + str(cache_path))
+    key = source_key(continental_path, file_sha256(continental_path))
+    continental = load_continental(continental_path)
+    adjacency = Adjacency(continental['GEOID'].to_numpy(), build_adjacency(continental.geometry, contiguity, tolerance))
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.stem + '.tmp.npz')
+    np.savez_compressed(tmp_path, geoids=adjacency.geoids.to_numpy(), indptr=adjacency.matrix.indptr,
+                        indices=adjacency.matrix.indices, contiguity=contiguity, tolerance=float(tolerance),
+                        size=key['size'], mtime_ns=key['mtime_ns'], sha256=key['sha256'])
+    os.replace(tmp_path, cache_path)
+    return adjacency
+
+def _neighbor_sums(adjacency, values):
+    """
+    Per county and column: sum over neighbors with a value, and how many there are.
+    """
+    known = np.isfinite(values)
+    sums = adjacency.matrix @ np.where(known, values, 0.)
+    counts = adjacency.matrix @ known.astype(np.float32)
+    return sums, counts
+
+def fill_missing(adjacency, values, max_rounds=10):
+    """
+    Fills NaN cells of a (counties, variables) array with the mean of their neighbors that have
+    a value. Each round fills what it can from the previous one, so gaps of several counties
+    fill from their edges inward; cells still empty after max_rounds (e.g. islands) stay NaN.
+    Returns (filled values, boolean mask of imputed cells).
+    """
+    values = np.array(values, dtype=np.float64, ndmin=2).reshape(len(adjacency), -1)
+    imputed = np.zeros(values.shape, dtype=bool)
+    for _ in range(max_rounds):
+        missing = ~np.isfinite(values)
+        if not missing.any():
+            break
+        sums, counts = _neighbor_sums(adjacency, values)
+        fill = missing & (counts > 0)
+        if not fill.any():
+            break
+        values[fill] = sums[fill] / counts[fill]
+        imputed |= fill
+    return values, imputed
+
+def smooth(adjacency, values, self_weight=1.):
+    """
+    Neighborhood mean of every column: (self_weight * value + sum of neighbors) / weights,
+    over the counties that have a value.
+    """
+    values = np.array(values, dtype=np.float64, ndmin=2).reshape(len(adjacency), -1)
+    sums, counts = _neighbor_sums(adjacency, values)
+    known = np.isfinite(values)
+    sums += self_weight * np.where(known, values, 0.)
+    counts += self_weight * known
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def flag_outliers(adjacency, values, z=3., min_neighbors=3):
+    """
+    True where a value is more than z standard deviations from the mean of its neighbors.
+    Counties with fewer than min_neighbors valued neighbors are never flagged.
+    """
+    values = np.array(values, dtype=np.float64, ndmin=2).reshape(len(adjacency), -1)
+    sums, counts = _neighbor_sums(adjacency, values)
+    squares = adjacency.matrix @ np.where(np.isfinite(values), values, 0.) ** 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+        std = np.sqrt(np.maximum(squares / counts - mean ** 2, 0.))
+        # a flat neighborhood still flags a county that differs from it
+        return (counts >= min_neighbors) & (np.abs(values - mean) > z * np.maximum(std, 1e-9))
+
+def fill_frame(adjacency, frame, columns):
+    """
+    frame (GEOID plus columns, any subset of the graph's counties) -> a frame over every county
+    of the graph with missing counties and NaN values of columns filled from their neighbors.
+    Returns (filled frame, number of imputed values per column).
+    """
+    values = frame.set_index('GEOID')[list(columns)].reindex(adjacency.geoids).to_numpy(dtype=np.float64)
+    filled, imputed = fill_missing(adjacency, values)
+    result = pd.DataFrame(filled, columns=list(columns))
+    result = result.astype({column: frame[column].dtype for column in columns if pd.api.types.is_float_dtype(frame[column])})
+    result.insert(0, 'GEOID', adjacency.geoids.to_numpy())
+    return result, dict(zip(columns, imputed.sum(axis=0).tolist()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the county contiguity graph and flag values unlike their neighbors.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--contiguity', choices=CONTIGUITY, default='queen')
+    parser.add_argument('--tolerance', type=float, default=0., help="meters between borders still counted as touching")
+    parser.add_argument('--flag', nargs='+', metavar='COLUMN', help="list counties whose COLUMN differs from their neighbors")
+    parser.add_argument('--z', type=float, default=3.)
+    args = parser.parse_args()
+
+    parent_path = Path(args.parent)
+    adjacency = load_adjacency(parent_path / 'data/continental.csv', args.contiguity, args.tolerance)
+    degree = adjacency.degree()
+    print(f"{len(adjacency)} counties, {adjacency.matrix.nnz // 2} {args.contiguity} pairs, "
+          f"{degree.mean():.2f} neighbors on average, {(degree == 0).sum()} without neighbors")
+    if args.flag:
+        all_data = read_all_data(parent_path / 'data/all_data.parquet', args.flag)
+        graph = adjacency.align(all_data['GEOID'])
+        flags = flag_outliers(graph, all_data[args.flag].to_numpy(dtype=np.float64), args.z)
+        for i, column in enumerate(args.flag):
+            print(f"{column}: {flags[:, i].sum()} counties flagged {all_data['GEOID'][flags[:, i]].tolist()[:20]}")
@@ -0,0 +1,109 @@
+import numpy as np
+from geoid import convert_geoid_data_to_number
+from geoid_join import align_on_geoid, print_coverage
+from noaa_loader import load_noaa_files
+from regimes import classify
+import instrument
+
+# column name and path (relative to the repo root) of every NOAA file the analysis uses
+NOAA_FILES = [
+    ("HDD", 'data/hdd_with_meta.csv'),
+    ("CDD", 'data/cdd_with_meta.csv'),
+    ("PALMER MOD INDEX", 'data/palmer_mod_drought_index_august.csv'),
+    ("MAX TEMP JUN", 'data/max_temp_june.csv'),
+    ("MAX TEMP JUL", 'data/max_temp_july.csv'),
+    ("MAX TEMP AUG", 'data/max_temp_august.csv'),
+    ("MIN TEMP JAN", 'data/min_temp_january.csv'),
+    ("MIN TEMP FEB", 'data/min_temp_february.csv'),
+    ("MIN TEMP DEC", 'data/min_temp_december.csv'),
+]
+
+def reformat_geodata(og_data, val_name):
+    og_data = convert_geoid_data_to_number(og_data, "ID")
+    og_data = og_data.loc[:, ['ID', 'Value']]
+    og_data.rename(columns= {"Value" : val_name}, inplace=True)
+    og_data.rename(columns= {"ID" : "GEOID"}, inplace=True)
+    return og_data
+
+def analyze_data(all_data, thresholds=None):
+    """
+    Adds HDD_per_CDD, seasonal MIN/MAX TEMP and the roof regimes to the merged county data.
+    """
+    # HDD per CDD
+    all_data['CDD'].replace(0, np.nan)
+    all_data['HDD_per_CDD'] = all_data['HDD'] / all_data['CDD']
+
+    # Min temperature
+    all_data['MIN TEMP'] = all_data[['MIN TEMP JAN', 'MIN TEMP FEB', 'MIN TEMP DEC']].min(axis=1)
+
+    # Max temperature
+    all_data['MAX TEMP'] = all_data[['MAX TEMP JUN', 'MAX TEMP JUL', 'MAX TEMP AUG']].max(axis=1)
+
+    #create regimes, default thresholds live in regimes.DEFAULT_THRESHOLDS
+    roof_codes = classify(all_data, thresholds, regimes=['GREEN ROOF', 'COOL ROOF'])
+    all_data['GREEN ROOF'] = roof_codes['GREEN ROOF']
+    all_data['COOL ROOF'] = roof_codes['COOL ROOF'].astype(bool)
+    return all_data
+
+def join_variables(continental, variables, how='inner'):
+    """
+    continental plus one column per reformatted variable, aligned on GEOID in one pass.
+    how='outer' keeps continental counties a file is missing, as NaN.
+    """
+    dd_data, coverage = align_on_geoid(variables, how=how, index=continental['GEOID'])
+    print_coverage(coverage)
+    return continental.merge(dd_data, on='GEOID')
+
+def build_all_data(files, continental_path, thresholds=None, fill_missing=False, output_path=None,
+                   export_format='parquet'):
+    """
+    The whole analysis: load the (name, path) NOAA files and continental.csv, join them on GEOID,
+    classify, and write all_data to output_path (see export.write_all_data) if given.
+    fill_missing keeps counties a file is missing and fills them from their neighbors.
+    Every step is an instrument stage. Returns (all_data, paths written).
+    """
+    # geopandas only loads when the analysis runs, so importing this module stays cheap
+    from geometry_cache import load_continental
+    from export import write_all_data
+
+    # Header rows are detected per file, so the drought file needs no special casing
+    with instrument.stage('load') as stage:
+        noaa_files = load_noaa_files([path for _, path in files])
+        stage.rows = sum(len(noaa_file.data) for noaa_file in noaa_files)
+    for noaa_file in noaa_files:
+        print("Loaded " + str(noaa_file.meta['title']))
+
+    with instrument.stage('geometry') as stage:
+        continental = load_continental(continental_path)
+        stage.rows = len(continental)
+
+    with instrument.stage('reformat') as stage:
+        variables = [reformat_geodata(noaa_file.data, name) for (name, _), noaa_file in zip(files, noaa_files)]
+        stage.rows = sum(len(variable) for variable in variables)
+
+    with instrument.stage('merge') as stage:
+        all_data = join_variables(continental, variables, how='outer' if fill_missing else 'inner')
+        stage.rows = len(all_data)
+
+    if fill_missing:
+        from adjacency import load_adjacency, fill_frame
+        names = [name for name, _ in files]
+        with instrument.stage('fill missing', rows=len(all_data)):
+            adjacency = load_adjacency(continental_path).align(all_data['GEOID'])
+            filled, imputed = fill_frame(adjacency, all_data[['GEOID'] + names], names)
+            for name in names:
+                all_data[name] = filled[name].to_numpy()
+        for name, count in imputed.items():
+            if count:
+                print(f"{name}: imputed {count} counties from their neighbors")
+
+    with instrument.stage('analysis', rows=len(all_data)):
+        all_data = analyze_data(all_data, thresholds)
+
+    output_paths = []
+    if output_path is not None:
+        with instrument.stage('export', rows=len(all_data)):
+            output_paths = write_all_data(all_data, output_path, export_format)
+        for path in output_paths:
+            print("Data saved " + str(path))
+    return all_data, output_paths
@@ -0,0 +1,138 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import io
+import os
+import shutil
+import tempfile
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.colors as colors
+import geopandas as gpd
+
+# One choropleth to render. labels maps codes to category names for categorical maps,
+# label is the colorbar label for continuous maps.
+MapSpec = namedtuple('MapSpec', ['column', 'norm', 'cmap', 'title', 'output_path',
+                                 'label', 'labels', 'figsize', 'legend_kwds'],
+                     defaults=(None, None, (10, 6), None))
+
+# county frame loaded once per worker process by _init_worker
+_worker_data = None
+
+def _init_worker(data_path):
+    global _worker_data
+    matplotlib.use('Agg')
+    _worker_data = gpd.read_parquet(data_path)
+
+def render_map(all_data, spec, dpi=300):
+    """
+    Draws one spec with the same styling as geoplotting and saves it without showing it.
+    spec.output_path may also be a file-like object, e.g. io.BytesIO.
+    """
+    data = all_data
+    plot_kwds = {'cmap': spec.cmap, 'edgecolor': 'black', 'linewidth': 0.05, 'legend': True}
+    if spec.labels is not None:
+        data = all_data[[spec.column, 'geometry']].copy()
+        data[spec.column] = data[spec.column].astype(int).map(spec.labels)
+        plot_kwds['categorical'] = True
+        plot_kwds['legend_kwds'] = spec.legend_kwds or {'loc': 'lower right', 'title': "Advisability"}
+    else:
+        plot_kwds['norm'] = spec.norm
+        plot_kwds['legend_kwds'] = spec.legend_kwds or {'label': spec.label or spec.title, 'orientation': "horizontal"}
+
+    fig, ax = plt.subplots(figsize=spec.figsize)
+    data.plot(column=spec.column, ax=ax, **plot_kwds)
+    ax.set_axis_off()
+    ax.set_title(spec.title, fontsize=20)
+    if isinstance(spec.output_path, (str, Path)):
+        Path(spec.output_path).parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(spec.output_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return str(spec.output_path)
+
+def _render_in_worker(spec):
+    return render_map(_worker_data, spec)
+
+def _render_png_in_worker(spec, dpi):
+    buffer = io.BytesIO()
+    render_map(_worker_data, spec._replace(output_path=buffer), dpi)
+    return buffer.getvalue()
+
+class RenderPool:
+    """
+    Worker processes on the Agg backend that each load the county frame once. The frame
+    (only columns and geometry) is written to a temporary GeoParquet file rather than
+    pickled per map. Call close() when done.
+    """
+    def __init__(self, all_data, columns, max_workers=None):
+        self._tmp_dir = tempfile.mkdtemp(prefix='greenroof_render_')
+        data_path = Path(self._tmp_dir) / 'all_data.parquet'
+        all_data[sorted(set(columns)) + ['geometry']].to_parquet(data_path)
+        self.executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                            initializer=_init_worker, initargs=(str(data_path),))
+
+    def map(self, specs):
+        """
+        Renders specs to their output paths, returning the paths in spec order.
+        """
+        return list(self.executor.map(_render_in_worker, specs))
+
+    def submit_png(self, spec, dpi=300):
+        """
+        Renders one spec in a worker and returns a concurrent.futures.Future of the PNG bytes.
+        """
+        return self.executor.submit(_render_png_in_worker, spec, dpi)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+def render_batch(all_data, specs, max_workers=None):
+    """
+    Renders many MapSpecs in parallel worker processes on the Agg backend.
+    The county frame is written once to a GeoParquet file that each worker loads at start-up,
+    so it is not pickled per map. Returns the output paths in spec order.
+    """
+    specs = list(specs)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(specs))
+    if max_workers <= 1:
+        return [render_map(all_data, spec) for spec in specs]
+
+    pool = RenderPool(all_data, [spec.column for spec in specs], max_workers)
+    try:
+        return pool.map(specs)
+    finally:
+        pool.close()
+
+def geoplotting_specs(parent_path=None, image_dir=None):
+    """
+    The maps geoplotting draws one by one, as MapSpecs writing to image_dir (default parent_path/image).
+    """
+    image = Path(image_dir) if image_dir else Path(parent_path) / 'image'
+    hdd_norm = colors.TwoSlopeNorm(vmin=0., vcenter=1., vmax=15.)
+    min_norm = colors.TwoSlopeNorm(vmin=-30., vcenter=20., vmax=70.)
+    max_norm = colors.TwoSlopeNorm(vmin=60., vcenter=90., vmax=120.)
+    drought_norm = colors.TwoSlopeNorm(vmin=-10., vcenter=0., vmax=10.)
+    advisability = {0: "Not Advisable", 1: "Advisable", 2: "Highly Advisable"}
+    return [
+        MapSpec('GREEN ROOF', None, colors.ListedColormap(["#8dc1a3", '#2ecc71', "#cfcfcf"]),
+                "Areas Where Green Roofs are Advisable", image / 'green_roof.png',
+                labels=advisability, figsize=(20, 12)),
+        MapSpec('COOL ROOF', None, colors.ListedColormap(['#2ecc71', "#cfcfcf"]),
+                "Areas Where Cool Roofs are Advisable", image / 'cool_roof.png',
+                labels={0: "Not Advisable", 1: "Advisable"}, figsize=(20, 12)),
+        MapSpec('HDD_per_CDD', hdd_norm, 'RdYlBu_r', "2025 HDD/CDD by County",
+                image / 'hdd_per_cdd.png', label="2025 HDD per CDD"),
+        MapSpec('MIN TEMP', min_norm, 'RdYlBu_r', "2025 Minimum Temperature by County",
+                image / 'min_temp.png', label="2025 Minimum Temperature"),
+        MapSpec('MIN TEMP JAN', min_norm, 'RdYlBu_r', "January 2025 Minimum Temperature by County",
+                image / 'min_temp_jan.png', label="January 2025 Minimum Temperature"),
+        MapSpec('MAX TEMP', max_norm, 'RdYlBu_r', "2025 Maximum Temperature by County",
+                image / 'max_temp.png', label="2025 Maximum Temperature"),
+        MapSpec('MAX TEMP JUL', max_norm, 'RdYlBu_r', "July 2025 Maximum Temperature by County",
+                image / 'max_temp_july.png', label="July 2025 Maximum Temperature"),
+        MapSpec('MAX TEMP AUG', max_norm, 'RdYlBu_r', "August 2025 Maximum Temperature by County",
+                image / 'max_temp_aug.png', label="August 2025 Maximum Temperature"),
+        MapSpec('PALMER MOD INDEX', drought_norm, 'RdYlBu_r', "2025 Palmer Modified Drought Index by County",
+                image / 'drought.png', label="2025 Palmer Modified Drought Index"),
+    ]
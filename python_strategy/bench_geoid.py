@@ -0,0 +1,57 @@
+from pathlib import Path
+import time
+import numpy as np
+import pandas as pd
+from geoid import STATE_TO_FIPS, encode_geoids
+
+def legacy_convert_geoid(geoid_str):
+    """
+    The per-row converter the scripts used before geoid.py (dict rebuilt on every call).
+    """
+    state_to_fips = {k: f"{v:02d}" for k, v in STATE_TO_FIPS.items()}
+    letters = geoid_str[:2].upper()
+    numbers = geoid_str[3:]
+    state_code = state_to_fips.get(letters)
+    if state_code:
+        return int(f"{state_code}{numbers.zfill(3)}")
+    else:
+        return None
+
+def load_ids(parent_path):
+    hdd_path = parent_path / 'data/hdd_with_meta.csv'
+    if hdd_path.exists():
+        return pd.read_csv(hdd_path, comment='#', usecols=['ID'])['ID']
+    # fall back to synthetic county IDs
+    states = np.array(sorted(STATE_TO_FIPS))
+    rng = np.random.default_rng(0)
+    return pd.Series([f"{s}-{c:03d}" for s, c in zip(rng.choice(states, 3108), rng.integers(1, 999, 3108))])
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run_benchmark(parent_path, scales=(1, 100), repeat=3):
+    ids = load_ids(parent_path)
+    results = []
+    for scale in scales:
+        col = pd.Series(np.tile(ids.to_numpy(), scale))
+
+        legacy = col.apply(legacy_convert_geoid).to_numpy()
+        codes, _ = encode_geoids(col)
+        if not np.array_equal(legacy.astype(np.int64), codes.astype(np.int64)):
+            raise ValueError("encode_geoids disagrees with the legacy converter")
+
+        t_apply = best_of(lambda: col.apply(legacy_convert_geoid), repeat)
+        t_vector = best_of(lambda: encode_geoids(col), repeat)
+        results.append({'scale': scale, 'rows': len(col), 'apply_s': t_apply,
+                        'vectorized_s': t_vector, 'speedup': t_apply / t_vector})
+        print(f"{scale:>4}x ({len(col):>8} rows): apply {t_apply:.4f}s, "
+              f"vectorized {t_vector:.4f}s, speedup {t_apply / t_vector:.1f}x")
+    return results
+
+if __name__ == "__main__":
+    run_benchmark(Path(__file__).resolve().parent.parent)
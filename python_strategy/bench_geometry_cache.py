@@ -0,0 +1,36 @@
+from pathlib import Path
+import shutil
+import tempfile
+import time
+import pandas as pd
+from shapely import wkt
+from geometry_cache import load_continental
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def legacy_parse(continental_path):
+    continental = pd.read_csv(continental_path)
+    continental['geometry'] = continental['geometry'].apply(wkt.loads)
+    return continental
+
+def run_benchmark(continental_path):
+    cache_dir = Path(tempfile.mkdtemp())
+    cache_path = cache_dir / 'continental.parquet'
+    try:
+        _, t_legacy = timed(lambda: legacy_parse(continental_path))
+        _, t_cold = timed(lambda: load_continental(continental_path, cache_path))
+        warm, t_warm = timed(lambda: load_continental(continental_path, cache_path))
+    finally:
+        shutil.rmtree(cache_dir)
+    print(f"{len(warm)} counties")
+    print(f"read_csv + apply(wkt.loads): {t_legacy:.3f}s")
+    print(f"cold (parse + write cache):  {t_cold:.3f}s")
+    print(f"warm (read cache):           {t_warm:.3f}s ({t_legacy / t_warm:.1f}x faster than legacy)")
+    return {'legacy_s': t_legacy, 'cold_s': t_cold, 'warm_s': t_warm}
+
+if __name__ == "__main__":
+    parent_path = Path(__file__).resolve().parent.parent
+    run_benchmark(parent_path / 'data/continental.csv')
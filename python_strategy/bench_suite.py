@@ -0,0 +1,176 @@
+from pathlib import Path
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import shapely
+from geoid import STATE_TO_FIPS
+from noaa_loader import load_noaa_files
+from geometry_cache import load_continental, parse_continental
+from analysis import NOAA_FILES, reformat_geodata, analyze_data, join_variables
+from export import write_all_data
+from instrument import RssSampler, megabytes, peak_rss
+
+COUNTIES = 3107
+# (low, high) of the synthetic uniform values for each variable
+VALUE_RANGES = {
+    "HDD": (0., 9000.), "CDD": (0., 4500.), "PALMER MOD INDEX": (-6., 6.),
+    "MAX TEMP JUN": (70., 105.), "MAX TEMP JUL": (72., 110.), "MAX TEMP AUG": (72., 110.),
+    "MIN TEMP JAN": (-10., 50.), "MIN TEMP FEB": (-8., 52.), "MIN TEMP DEC": (-5., 50.),
+}
+CELL = 50000.
+
+def synthetic_ids(scale, seed=0):
+    """
+    NOAA-style IDs for scale x 3107 counties. Replica m numbers its counties from m * 100000,
+    which keeps state * 1000 + county unique across states at any scale.
+    """
+    rng = np.random.default_rng(seed)
+    states = np.array(sorted(STATE_TO_FIPS))
+    n = COUNTIES * scale
+    state = states[np.arange(n) % len(states)]
+    county = (np.arange(n) // len(states)) % 999 + 1 + (np.arange(n) // (len(states) * 999)) * 100000
+    order = rng.permutation(n)
+    return np.array([f"{s}-{c:03d}" for s, c in zip(state[order], county[order])])
+
+def write_noaa_csv(path, ids, column, rng):
+    low, high = VALUE_RANGES[column]
+    values = np.round(rng.uniform(low, high, len(ids)), 1)
+    mean = np.round(values - rng.normal(0, 2, len(ids)), 1)
+    frame = pd.DataFrame({'ID': ids, 'Name': 'Synthetic County', 'State': 'Synthetic',
+                          'Value': values, 'Rank': rng.integers(1, 131, len(ids)),
+                          'Anomaly (1901-2000 base period)': np.round(values - mean, 1),
+                          '1901-2000 Mean': mean})
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"# Title: Synthetic 2025 Contiguous U.S. County {column}\n")
+        f.write("# Units: Synthetic\n# Note: Period of Record: 131 Years\n")
+        frame.to_csv(f, index=False)
+
+def write_continental_csv(path, geoids, vertices_per_side=10):
+    """
+    One square polygon per county on a grid, in EPSG:5070-like metres, written as WKT.
+    """
+    n = len(geoids)
+    cols = int(np.ceil(np.sqrt(n * 1.6)))
+    row, col = np.divmod(np.arange(n), cols)
+    x0 = -2300000. + col * CELL
+    y0 = 300000. + row * CELL
+    t = np.linspace(0., 1., vertices_per_side + 1)[:-1]
+    ones = np.ones_like(t)
+    ring_x = np.concatenate([t, ones, 1. - t, 0. * t, [0.]]) * CELL
+    ring_y = np.concatenate([0. * t, t, ones, 1. - t, [0.]]) * CELL
+    coords = np.stack([x0[:, None] + ring_x, y0[:, None] + ring_y], axis=-1)
+    polygons = shapely.polygons(shapely.linearrings(coords))
+    pd.DataFrame({'GEOID': geoids, 'NAME': 'Synthetic County',
+                  'geometry': shapely.to_wkt(polygons, rounding_precision=1)}).to_csv(path, index=False)
+
+def make_dataset(root, scale, seed=0):
+    """
+    Writes the nine NOAA files multi_plot reads plus a matching continental.csv under root/data.
+    """
+    root = Path(root)
+    (root / 'data').mkdir(parents=True, exist_ok=True)
+    (root / 'image').mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    ids = synthetic_ids(scale, seed)
+    for column, path in NOAA_FILES:
+        write_noaa_csv(root / path, ids, column, rng)
+    fips = np.array([STATE_TO_FIPS[i[:2]] * 1000 + int(i[3:]) for i in ids], dtype=np.int64)
+    write_continental_csv(root / 'data/continental.csv', np.sort(fips))
+    return root
+
+def measure(results, scale, stage, func, rows=None):
+    """
+    Runs func once, recording wall time, CPU time and the peak RSS reached during the stage.
+    """
+    gc.collect()
+    sampler = RssSampler()
+    sampler.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    output = func()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    peak = sampler.stop()
+    if rows is None:
+        rows = len(output) if hasattr(output, '__len__') else None
+    results.append({'scale': scale, 'stage': stage, 'rows': rows, 'wall_s': round(wall, 6),
+                    'cpu_s': round(cpu, 6), 'peak_rss_mb': megabytes(peak),
+                    'rss_growth_mb': megabytes(None if None in (peak, sampler.start_rss) else peak - sampler.start_rss)})
+    print(f"{scale:>4}x  {stage:<20} {wall:8.3f}s  peak {results[-1]['peak_rss_mb']} MB")
+    return output
+
+def run_scale(root, scale, render=True):
+    results = []
+    data = root / 'data'
+    paths = [root / path for _, path in NOAA_FILES]
+
+    noaa_files = measure(results, scale, 'csv_parse', lambda: load_noaa_files(paths),
+                         rows=COUNTIES * scale * len(paths))
+    variables = measure(results, scale, 'geoid_convert', lambda: [
+        reformat_geodata(f.data.copy(), name) for (name, _), f in zip(NOAA_FILES, noaa_files)],
+        rows=COUNTIES * scale * len(paths))
+    continental = measure(results, scale, 'wkt_parse', lambda: parse_continental(data / 'continental.csv'))
+    cache_path = data / 'cache' / 'continental.parquet'
+    measure(results, scale, 'geometry_cache_cold', lambda: load_continental(data / 'continental.csv', cache_path, refresh=True))
+    continental = measure(results, scale, 'geometry_cache_warm', lambda: load_continental(data / 'continental.csv', cache_path))
+
+    all_data = measure(results, scale, 'merge', lambda: join_variables(continental, variables))
+    all_data = measure(results, scale, 'classify', lambda: analyze_data(all_data))
+    measure(results, scale, 'csv_export', lambda: write_all_data(all_data, data / 'all_data', 'csv'), rows=len(all_data))
+    measure(results, scale, 'parquet_export', lambda: write_all_data(all_data, data / 'all_data', 'parquet'), rows=len(all_data))
+
+    if render:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.colors as colors
+        from geoplotting import BaseMap
+
+        def render_map():
+            base_map = BaseMap(all_data)
+            base_map.render('MAX TEMP', norm=colors.TwoSlopeNorm(vmin=60., vcenter=90., vmax=120.),
+                            title="Synthetic Maximum Temperature")
+            base_map.fig.savefig(root / 'image/max_temp.png', dpi=300, bbox_inches='tight')
+            base_map.close()
+        measure(results, scale, 'render_map', render_map, rows=len(all_data))
+    return results
+
+def run_suite(scales=(1, 10, 100), output='bench_results.json', work_dir=None, render_max_scale=10, seed=0):
+    """
+    Generates synthetic data at each scale, times every stage and writes the results as JSON.
+    """
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'shapely': shapely.__version__,
+        },
+        'results': [],
+    }
+    for scale in scales:
+        root = Path(work_dir or tempfile.mkdtemp(prefix='greenroof_bench_')) / f"scale_{scale}"
+        try:
+            make_dataset(root, scale, seed)
+            report['results'] += run_scale(root, scale, render=scale <= render_max_scale)
+        finally:
+            if work_dir is None:
+                shutil.rmtree(root.parent, ignore_errors=True)
+    report['meta']['peak_rss_mb'] = megabytes(peak_rss())
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Results saved " + str(output))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic data.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--work-dir', help="keep the generated datasets here instead of a temp dir")
+    parser.add_argument('--render-max-scale', type=int, default=10, help="skip map rendering above this scale")
+    args = parser.parse_args()
+    run_suite(args.scales, args.output, args.work_dir, args.render_max_scale)
@@ -0,0 +1,213 @@
+from collections import namedtuple
+from pathlib import Path
+import argparse
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from pyproj import Transformer
+from geometry_cache import CONTINENTAL_CRS, file_sha256, source_key, source_unchanged
+from export import export_paths, read_all_data
+from raster_render import build_label_grid
+
+WGS84 = "EPSG:4326"
+# grid value for cells a county border passes through; points there get an exact polygon test
+AMBIGUOUS = -2
+
+# grid holds, per cell, the row of the county covering the whole cell, -1 where no county
+# touches the cell and AMBIGUOUS near borders. bounds/resolution are as in raster_render.LabelGrid.
+LookupGrid = namedtuple('LookupGrid', ['grid', 'bounds', 'resolution'])
+
+def build_lookup_grid(counties, resolution=2000.):
+    """
+    Labels every cell by its center like raster_render.build_label_grid, then marks the cells
+    a county boundary could cross as AMBIGUOUS. Boundaries are sampled every resolution / 2,
+    so every crossed cell lies in the 3 x 3 block around some sample.
+    """
+    label_grid = build_label_grid(counties, resolution)
+    grid = label_grid.grid
+    height, width = grid.shape
+    minx, miny, maxx, maxy = label_grid.bounds
+    boundary = shapely.segmentize(shapely.boundary(np.asarray(counties.geometry)), resolution / 2)
+    coords = shapely.get_coordinates(boundary)
+    rows = np.floor((maxy - coords[:, 1]) / resolution).astype(np.int64)
+    cols = np.floor((coords[:, 0] - minx) / resolution).astype(np.int64)
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            r, c = rows + dr, cols + dc
+            ok = (r >= 0) & (r < height) & (c >= 0) & (c < width)
+            grid[r[ok], c[ok]] = AMBIGUOUS
+    return LookupGrid(grid, label_grid.bounds, label_grid.resolution)
+
+class CountyLookup:
+    """
+    WGS84 point -> county lookup carrying each county's exported climate variables and regime
+    codes, e.g.
+
+        lookup = load_lookup(parent_path / 'data/all_data.parquet')
+        scores = lookup.lookup(buildings['lon'], buildings['lat'])
+
+    Most points are resolved from the lookup grid by array indexing; only points in border
+    cells go through one vectorized STRtree query per batch.
+    """
+    def __init__(self, counties, lookup_grid):
+        self.counties = counties
+        self.geoids = counties['GEOID'].to_numpy()
+        self.lookup_grid = lookup_grid
+        self.tree = shapely.STRtree(np.asarray(counties.geometry))
+        self._to_albers = Transformer.from_crs(WGS84, CONTINENTAL_CRS, always_xy=True)
+
+    def locate(self, x, y):
+        """
+        Row of the county containing each EPSG:5070 point, -1 outside every county.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        grid, (minx, miny, maxx, maxy), resolution = self.lookup_grid
+        rows = np.floor((maxy - y) / resolution)
+        cols = np.floor((x - minx) / resolution)
+        # the grid covers every county, so points off it (or NaN) are outside all of them
+        on_grid = (rows >= 0) & (rows < grid.shape[0]) & (cols >= 0) & (cols < grid.shape[1])
+        positions = np.full(len(x), -1, dtype=np.int32)
+        positions[on_grid] = grid[rows[on_grid].astype(np.int64), cols[on_grid].astype(np.int64)]
+
+        check = np.flatnonzero(positions == AMBIGUOUS)
+        positions[check] = -1
+        if len(check):
+            point_idx, county_idx = self.tree.query(shapely.points(x[check], y[check]), predicate='intersects')
+            # a point on a shared border hits both counties, the first hit wins
+            first = np.unique(point_idx, return_index=True)[1]
+            positions[check[point_idx[first]]] = county_idx[first]
+        return positions
+
+    def take(self, positions, columns=None):
+        """
+        GEOID plus columns for each county row in positions. Rows with position -1 get GEOID -1,
+        NaN for measures and -1 for regime codes.
+        """
+        columns = [c for c in (columns if columns is not None else self.counties.columns)
+                   if c not in ('GEOID', 'geometry')]
+        found = positions >= 0
+        rows = np.where(found, positions, 0)
+        result = {'GEOID': np.where(found, self.geoids[rows], -1).astype(self.geoids.dtype)}
+        for column in columns:
+            values = self.counties[column].to_numpy()[rows]
+            if np.issubdtype(values.dtype, np.floating):
+                result[column] = np.where(found, values, np.nan).astype(values.dtype)
+            elif np.issubdtype(values.dtype, np.integer):
+                result[column] = np.where(found, values, -1).astype(values.dtype)
+            else:
+                result[column] = np.where(found, values.astype(object), None)
+        return pd.DataFrame(result)
+
+    def lookup(self, lon, lat, columns=None, batch_size=1000000):
+        """
+        Reprojects WGS84 lon/lat to EPSG:5070 batch_size points at a time and returns one row
+        per point: GEOID, then the requested columns (default every exported column).
+        """
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        positions = np.empty(len(lon), dtype=np.int32)
+        for start in range(0, len(lon), batch_size):
+            stop = min(start + batch_size, len(lon))
+            x, y = self._to_albers.transform(lon[start:stop], lat[start:stop])
+            positions[start:stop] = self.locate(x, y)
+        return self.take(positions, columns)
+
+def default_lookup_path(all_data_path, resolution):
+    all_data_path = Path(all_data_path)
+    return all_data_path.parent / 'cache' / f"{all_data_path.stem}_lookup_{float(resolution):g}m.npz"
+
+def load_lookup(all_data_path, resolution=2000., cache_path=None):
+    """
+    CountyLookup over an exported all_data.parquet (see export.write_all_data). The lookup grid
+    is persisted next to the export and rebuilt only when the export or resolution changed;
+    the export files are only hashed when their size/mtime changed (geometry_cache.source_unchanged).
+    The STRtree itself is rebuilt on load, which takes milliseconds for the county polygons.
+    """
+    all_data_path = Path(all_data_path).with_suffix('.parquet')
+    cache_path = Path(cache_path) if cache_path else default_lookup_path(all_data_path, resolution)
+    counties = read_all_data(all_data_path, geometry=True)
+    paths = export_paths(all_data_path)
+    if cache_path.exists():
+        cached = np.load(cache_path)
+        if 'sources' in cached.files and float(cached['resolution']) == float(resolution):
+            sources = json.loads(str(cached['sources']))
+            # one stamp per export file, see source_unchanged
+            if len(sources) == len(paths) and all(
+                    source_unchanged(path, key, cache_path.with_name(f"{cache_path.name}.{path.stem}"))
+                    for path, key in zip(paths, sources)):
+                lookup_grid = LookupGrid(cached['grid'], tuple(cached['bounds']), float(cached['resolution']))
+                return CountyLookup(counties, lookup_grid)
+
+    print("Building lookup grid " + str(cache_path))
+    sources = [source_key(path, file_sha256(path)) for path in paths]
+    lookup_grid = build_lookup_grid(counties, resolution)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.stem + '.tmp.npz')
+    np.savez_compressed(tmp_path, grid=lookup_grid.grid, bounds=np.asarray(lookup_grid.bounds),
+                        resolution=lookup_grid.resolution, sources=json.dumps(sources))
+    os.replace(tmp_path, cache_path)
+    return CountyLookup(counties, lookup_grid)
+
+def score_buildings(lookup, input_path, output_path, lon='lon', lat='lat', columns=None, chunksize=1000000):
+    """
+    Streams a building CSV chunksize rows at a time and writes it back with the county
+    columns appended, as parquet or csv depending on the output suffix. Returns the row count.
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    writer = None
+    rows = 0
+    chunks = 0
+
+    def write(chunk):
+        nonlocal writer
+        scored = lookup.lookup(chunk[lon].to_numpy(), chunk[lat].to_numpy(), columns)
+        scored.index = chunk.index
+        chunk = chunk.join(scored, rsuffix='_county')
+        if output_path.suffix == '.csv':
+            chunk.to_csv(tmp_path, mode='a' if chunks else 'w', header=not chunks, index=False)
+        else:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression='zstd')
+            writer.write_table(table.cast(writer.schema))
+
+    try:
+        for chunk in pd.read_csv(input_path, chunksize=chunksize):
+            write(chunk)
+            chunks += 1
+            rows += len(chunk)
+        if not chunks:
+            # a header without rows still gets an (empty) output with every column
+            write(pd.read_csv(input_path, nrows=0))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, output_path)
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append each building's county, climate variables and roof regimes.")
+    parser.add_argument('buildings', help="CSV with one row per building")
+    parser.add_argument('output', help="scored .parquet or .csv")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/all_data.parquet")
+    parser.add_argument('--lon', default='lon', help="longitude column (WGS84)")
+    parser.add_argument('--lat', default='lat', help="latitude column (WGS84)")
+    parser.add_argument('--columns', nargs='+', help="county columns to append (default all)")
+    parser.add_argument('--resolution', type=float, default=2000., help="lookup grid cell size in metres")
+    parser.add_argument('--chunksize', type=int, default=1000000)
+    args = parser.parse_args()
+
+    lookup = load_lookup(Path(args.parent) / 'data/all_data.parquet', args.resolution)
+    start = time.perf_counter()
+    rows = score_buildings(lookup, args.buildings, args.output, args.lon, args.lat, args.columns, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} buildings in {elapsed:.1f}s ({rows / max(elapsed, 1e-9) / 1e6 * 60:.1f}M per minute)")
+    print("Data saved " + str(args.output))
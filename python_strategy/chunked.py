@@ -0,0 +1,135 @@
+from pathlib import Path
+import argparse
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from geoid import RESOLUTIONS, state_of
+from noaa_loader import read_noaa_header
+from geometry_cache import default_cache_path, is_cache_valid, write_geometry_cache_chunked, iter_geometry_cache
+from geoid_join import align_on_geoid, print_coverage
+from analysis import NOAA_FILES, reformat_geodata, analyze_data
+from export import AllDataWriter
+import instrument
+
+def iter_variable(path, name, chunksize=50000):
+    """
+    Streams one variable file as GEOID/name frames of at most chunksize rows.
+    NOAA county files ('LL-###' IDs) are converted like multi_plot does; tract and block group
+    files are plain CSVs with a numeric census GEOID column and a Value column.
+    """
+    header_rows = read_noaa_header(path)['header_rows']
+    key = 'ID' if 'ID' in pd.read_csv(path, skiprows=header_rows, nrows=0).columns else 'GEOID'
+    dtype = {'ID': str} if key == 'ID' else {'GEOID': 'int64'}
+    # Value keeps its inferred dtype like noaa_loader, so the county csv matches multi_plot's
+    for chunk in pd.read_csv(path, skiprows=header_rows, usecols=list(dtype) + ['Value'], dtype=dtype, chunksize=chunksize):
+        if key == 'ID':
+            yield reformat_geodata(chunk, name)
+        else:
+            yield chunk.rename(columns={'Value': name})
+
+def spill_variables(variables, spill_dir, resolution='county', chunksize=50000):
+    """
+    Streams every (name, path) variable once and writes its rows to one small parquet file per
+    state and chunk, spill_dir/<state>/<variable>-<chunk>.parquet, so a state loads on its own.
+    """
+    spill_dir = Path(spill_dir)
+    for i, (name, path) in enumerate(variables):
+        for k, chunk in enumerate(iter_variable(path, name, chunksize)):
+            states = state_of(chunk['GEOID'], resolution)
+            for state in np.unique(states):
+                state_dir = spill_dir / f"{state:02d}"
+                state_dir.mkdir(parents=True, exist_ok=True)
+                table = pa.Table.from_pandas(chunk.loc[states == state], preserve_index=False)
+                pq.write_table(table, state_dir / f"{i}-{k}.parquet")
+
+def load_partition(spill_dir, state, variables):
+    """
+    The spilled GEOID/value frames of one state, one frame per variable in variables order.
+    """
+    state_dir = Path(spill_dir) / f"{state:02d}"
+    frames = []
+    for i, (name, _) in enumerate(variables):
+        parts = sorted(state_dir.glob(f"{i}-*.parquet"), key=lambda part: int(part.stem.split('-')[1]))
+        if parts:
+            frames.append(pd.concat([pq.read_table(part).to_pandas() for part in parts], ignore_index=True))
+        else:
+            frames.append(pd.DataFrame({'GEOID': np.empty(0, dtype=np.int64), name: np.empty(0, dtype=np.float64)}))
+    return frames
+
+def run_chunked(parent_path, variables=None, continental_path=None, output_path=None, resolution='county',
+                export_format='parquet', chunksize=50000, thresholds=None, work_dir=None):
+    """
+    The multi_plot analysis in state partitions, for tract and block group inputs that do not fit
+    in memory. Variables are spilled per state, then the geometry is streamed chunksize rows at a
+    time in file order; each chunk is joined with its states' variables, classified and appended
+    to the export. Peak memory depends on chunksize and the largest state, not on the row count.
+    At county resolution the export is byte-identical to multi_plot's, and the csv to the one the
+    original multi_plot.py wrote (tests/test_chunked.py checks both against a fixture).
+    variables are (name, path) pairs relative to parent_path (default analysis.NOAA_FILES).
+    Returns the paths written.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError("resolution must be one of " + ", ".join(RESOLUTIONS) + ", got " + repr(resolution))
+    parent_path = Path(parent_path)
+    variables = [(name, parent_path / path) for name, path in (variables or NOAA_FILES)]
+    continental_path = parent_path / (continental_path or 'data/continental.csv')
+    output_path = output_path or parent_path / 'data/all_data'
+
+    cache_path = default_cache_path(continental_path)
+    with instrument.stage('geometry cache'):
+        if not (cache_path.exists() and is_cache_valid(continental_path, cache_path, writer='chunked')):
+            print("Building geometry cache " + str(cache_path))
+            write_geometry_cache_chunked(continental_path, cache_path, chunksize)
+
+    spill_dir = Path(tempfile.mkdtemp(prefix='greenroof_spill_', dir=work_dir))
+    try:
+        with instrument.stage('spill'):
+            spill_variables(variables, spill_dir, resolution, chunksize)
+
+        partitions = {}
+        missing = {}
+        geoid_type = np.int32 if resolution == 'county' else np.int64
+        with AllDataWriter(output_path, export_format, geoid_type) as writer:
+            for geometry in iter_geometry_cache(cache_path, chunksize):
+                with instrument.stage('chunk', rows=len(geometry)):
+                    # geometry files are usually sorted by GEOID, so a state spanning two chunks stays loaded
+                    states = np.unique(state_of(geometry['GEOID'], resolution))
+                    partitions = {state: partitions[state] if state in partitions else load_partition(spill_dir, state, variables)
+                                  for state in states}
+                    sources = [pd.concat([partitions[state][i] for state in states], ignore_index=True)
+                               for i in range(len(variables))]
+                    dd_data, coverage = align_on_geoid(sources, how='inner', index=geometry['GEOID'])
+                    for name, geoids in coverage.items():
+                        missing.setdefault(name, []).append(geoids)
+                    writer.write(analyze_data(geometry.merge(dd_data, on='GEOID'), thresholds))
+        print_coverage({name: np.concatenate(geoids) for name, geoids in missing.items()})
+        print(f"Processed {writer.rows} rows")
+        return writer.paths
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the roof regime analysis in bounded memory, one state partition at a time.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--resolution', choices=list(RESOLUTIONS), default='county')
+    parser.add_argument('--continental', default='data/continental.csv',
+                        help="geometry CSV (GEOID plus WKT geometry in EPSG:5070), relative to --parent")
+    parser.add_argument('--variable', action='append', metavar='NAME=PATH',
+                        help="variable file relative to --parent, repeatable (default: the NOAA county files)")
+    parser.add_argument('--output', help="export path without suffix (default data/all_data)")
+    parser.add_argument('--chunksize', type=int, default=50000, help="rows per geometry and variable chunk")
+    parser.add_argument('--work-dir', help="where to spill partitions (default a temp dir)")
+    parser.add_argument('--csv', action='store_true', help="export all_data.csv instead of parquet")
+    parser.add_argument('--profile', nargs='?', const='1', help="write per-stage timings as JSON lines (default greenroof_profile.jsonl)")
+    args = parser.parse_args()
+    if args.profile:
+        instrument.enable(args.profile)
+
+    variables = [tuple(v.split('=', 1)) for v in args.variable] if args.variable else None
+    for output_path in run_chunked(args.parent, variables, args.continental, args.output, args.resolution,
+                                   'csv' if args.csv else 'parquet', args.chunksize, work_dir=args.work_dir):
+        print("Data saved " + str(output_path))
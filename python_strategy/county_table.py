@@ -0,0 +1,93 @@
+from collections import namedtuple
+from pathlib import Path
+import argparse
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from geoid import geoid_dtype
+from export import REGIME_COLUMNS, read_all_data
+
+# data is indexed by GEOID (int32 for counties) with float32 measures, int8 regime codes,
+# downcast integers and categorical strings. geometry is the shapely array kept aside (None if
+# there was none), dtypes the original column -> dtype in original order, used to convert back.
+CountyTable = namedtuple('CountyTable', ['data', 'geometry', 'crs', 'dtypes'])
+
+def compact_column(values):
+    """
+    The smallest dtype that holds a column without losing anything the analysis uses.
+    """
+    if values.name in REGIME_COLUMNS or pd.api.types.is_bool_dtype(values):
+        return values.astype(np.int8)
+    if pd.api.types.is_float_dtype(values):
+        return values.astype(np.float32)
+    if pd.api.types.is_integer_dtype(values):
+        return pd.to_numeric(values, downcast='integer')
+    if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+        return values.astype('category')
+    return values
+
+def to_compact(all_data):
+    """
+    all_data (GeoDataFrame or DataFrame with a GEOID column) -> CountyTable.
+    The geometry objects are shared, not copied.
+    """
+    dtypes = {column: all_data[column].dtype for column in all_data.columns}
+    frame = pd.DataFrame(all_data.drop(columns='geometry', errors='ignore'))
+    data = pd.DataFrame({column: compact_column(frame[column]) for column in frame.columns if column != 'GEOID'})
+    data.index = pd.Index(frame['GEOID'].to_numpy().astype(geoid_dtype(frame['GEOID'])), name='GEOID')
+    geometry = np.asarray(all_data.geometry) if 'geometry' in all_data else None
+    crs = getattr(all_data, 'crs', None) if geometry is not None else None
+    return CountyTable(data, geometry, crs, dtypes)
+
+def to_geodataframe(table, restore_dtypes=False):
+    """
+    CountyTable -> GeoDataFrame (DataFrame if it had no geometry) in the original column order.
+    Columns stay compact unless restore_dtypes, which casts them back to the original dtypes.
+    """
+    frame = table.data.reset_index()
+    if restore_dtypes:
+        frame = frame.astype({column: dtype for column, dtype in table.dtypes.items() if column in frame})
+    if table.geometry is None:
+        return frame[[column for column in table.dtypes if column in frame]]
+    all_data = gpd.GeoDataFrame(frame, geometry=table.geometry, crs=table.crs)
+    return all_data[list(table.dtypes)]
+
+def memory_report(all_data, table=None):
+    """
+    Deep (string contents included) bytes per column of all_data and of its compact table.
+    Geometry is the same shapely objects in both and is left out.
+    """
+    table = table if table is not None else to_compact(all_data)
+    before_frame = pd.DataFrame(all_data.drop(columns='geometry', errors='ignore'))
+    before = before_frame.memory_usage(deep=True, index=False)
+    after = table.data.memory_usage(deep=True, index=False)
+    after['GEOID'] = table.data.index.memory_usage(deep=True)
+    report = pd.DataFrame({
+        'dtype_before': before_frame.dtypes.astype(str),
+        'dtype_after': [str(table.data.index.dtype) if column == 'GEOID' else str(table.data[column].dtype)
+                        for column in before_frame.columns],
+        'bytes_before': before,
+        'bytes_after': after.reindex(before.index),
+    })
+    report.loc['total'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['ratio'] = (report['bytes_before'] / report['bytes_after']).round(2)
+    return report
+
+def print_memory_report(report):
+    for column, row in report.iterrows():
+        print(f"{column:<18} {row['dtype_before']:>10} -> {row['dtype_after']:<10} "
+              f"{row['bytes_before'] / 1024:>10.1f} KB -> {row['bytes_after'] / 1024:>9.1f} KB  x{row['ratio']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory of all_data as pandas infers it with the compact table.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--input', help="all_data.parquet or all_data.csv (what pandas infers, see greenroof.py analyze --format csv); "
+                                        "default data/all_data.parquet")
+    args = parser.parse_args()
+
+    path = Path(args.input) if args.input else Path(args.parent) / 'data/all_data.parquet'
+    all_data = pd.read_csv(path) if path.suffix == '.csv' else read_all_data(path, geometry=True)
+    if 'geometry' in all_data and not isinstance(all_data, gpd.GeoDataFrame):
+        all_data = gpd.GeoDataFrame(all_data, geometry=gpd.GeoSeries.from_wkt(all_data['geometry']))
+    print_memory_report(memory_report(all_data))
@@ -0,0 +1,229 @@
+from pathlib import Path
+import argparse
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from geoid import convert_geoid_data_to_number
+from noaa_loader import load_noaa_files
+from noaa_fetch import series_matrix, parse_years
+from regimes import classify
+
+MONTHS = np.arange(1, 13)
+
+def _open_array(path, shape, dtype, fill):
+    """
+    The .npy at path as a writable memmap, created (filled with fill) if missing or of another shape.
+    """
+    if path.exists():
+        array = np.load(path, mmap_mode='r+')
+        if array.shape == shape and array.dtype == dtype:
+            return array
+        del array
+    array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    array[:] = fill
+    return array
+
+def build_cube(store_dir, cube_dir, geoids, variables, years, batch=24):
+    """
+    Loads the monthly Climate at a Glance files fetched into store_dir (noaa_fetch.series_matrix
+    layout, one month each) into cube_dir: per variable a float32 year x month x county .npy and
+    its 1901-2000 monthly normals, counties in sorted GEOID order of geoids.
+    The year axis runs every year from the first to the last of years (e.g. 2019,2021 also
+    covers 2020), so year - first year is always the position and windows never skip a gap.
+    Each month's source mtime is kept, so running it again only reloads files that changed.
+    Missing files and counties stay NaN. Returns the number of files loaded.
+    """
+    store_dir, cube_dir = Path(store_dir), Path(cube_dir)
+    cube_dir.mkdir(parents=True, exist_ok=True)
+    geoids = np.unique(np.asarray(geoids, dtype=np.int64))
+    years = list(range(min(years), max(years) + 1))
+    meta_path = cube_dir / 'meta.json'
+    geoids_path = cube_dir / 'geoids.npy'
+    if meta_path.exists() and geoids_path.exists():
+        meta = json.loads(meta_path.read_text())
+        stale = meta['years'] != [years[0], years[-1]] or not np.array_equal(np.load(geoids_path), geoids)
+    else:
+        meta, stale = {'variables': []}, True
+    if stale:
+        # other axes, start over
+        for path in cube_dir.glob('*.npy'):
+            path.unlink()
+        meta = {'variables': []}
+    np.save(geoids_path, geoids)
+    index = pd.Index(geoids)
+
+    loaded = 0
+    for variable in variables:
+        values = _open_array(cube_dir / f"{variable}.npy", (len(years), 12, len(geoids)), np.float32, np.nan)
+        normals = _open_array(cube_dir / f"{variable}_normals.npy", (12, len(geoids)), np.float32, np.nan)
+        sources = _open_array(cube_dir / f"{variable}_sources.npy", (len(years), 12), np.int64, 0)
+        changed = []
+        for series in series_matrix([variable], years, MONTHS, 1):
+            path = store_dir / series.path
+            mtime_ns = os.stat(path).st_mtime_ns if path.exists() else 0
+            if mtime_ns != sources[series.year - years[0], series.month - 1]:
+                changed.append((series, path, mtime_ns))
+        for start in range(0, len(changed), batch):
+            part = changed[start:start + batch]
+            noaa_files = load_noaa_files([path for _, path, mtime_ns in part if mtime_ns], extra=('1901-2000 Mean',),
+                                         dtype='float32')
+            noaa_files = iter(noaa_files)
+            for series, path, mtime_ns in part:
+                y, m = series.year - years[0], series.month - 1
+                values[y, m] = np.nan
+                if mtime_ns:
+                    data = convert_geoid_data_to_number(next(noaa_files).data, 'ID')
+                    positions = index.get_indexer(data['ID'].to_numpy())
+                    hit = positions >= 0
+                    values[y, m, positions[hit]] = data['Value'].to_numpy()[hit]
+                    normals[m, positions[hit]] = data['1901-2000 Mean'].to_numpy()[hit]
+                    loaded += 1
+                sources[y, m] = mtime_ns
+        for array in (values, normals, sources):
+            array.flush()
+        if variable not in meta['variables']:
+            meta['variables'].append(variable)
+
+    meta['years'] = [years[0], years[-1]]
+    tmp_path = meta_path.with_suffix('.json.tmp')
+    tmp_path.write_text(json.dumps(meta))
+    os.replace(tmp_path, meta_path)
+    return loaded
+
+class Cube:
+    """
+    Read-only view of a cube_dir written by build_cube. cube[variable] is the memory-mapped
+    (years, 12, counties) array, so slices read only the pages they touch.
+    """
+    def __init__(self, cube_dir):
+        cube_dir = Path(cube_dir)
+        meta = json.loads((cube_dir / 'meta.json').read_text())
+        self.years = np.arange(meta['years'][0], meta['years'][1] + 1)
+        self.variables = list(meta['variables'])
+        self.geoids = pd.Index(np.load(cube_dir / 'geoids.npy'))
+        self._values = {v: np.load(cube_dir / f"{v}.npy", mmap_mode='r') for v in self.variables}
+        self._normals = {v: np.load(cube_dir / f"{v}_normals.npy", mmap_mode='r') for v in self.variables}
+
+    def __getitem__(self, variable):
+        return self._values[variable]
+
+    def _year(self, year):
+        if not self.years[0] <= year <= self.years[-1]:
+            raise KeyError(f"year {year} outside {self.years[0]}-{self.years[-1]}")
+        return year - self.years[0]
+
+    def county(self, geoid, variables=None):
+        """
+        One county's full history: a (year, month) indexed frame with a column per variable.
+        """
+        position = self.geoids.get_indexer([geoid])[0]
+        if position < 0:
+            raise KeyError("unknown GEOID " + repr(geoid))
+        index = pd.MultiIndex.from_product([self.years, MONTHS], names=['year', 'month'])
+        return pd.DataFrame({v: self._values[v][:, :, position].ravel() for v in variables or self.variables}, index=index)
+
+    def month(self, year, month, variables=None):
+        """
+        One month across all counties: GEOID plus a column per variable.
+        """
+        y = self._year(year)
+        frame = pd.DataFrame({v: np.asarray(self._values[v][y, month - 1]) for v in variables or self.variables})
+        frame.insert(0, 'GEOID', self.geoids.to_numpy())
+        return frame
+
+    def anomaly(self, variable):
+        """
+        (years, 12, counties) departure from the 1901-2000 monthly mean.
+        """
+        return self._values[variable] - self._normals[variable][None, :, :]
+
+    def rolling_mean(self, variable, window, min_periods=None, block=4096):
+        """
+        Mean over the window months ending at each month, as a (years, 12, counties) float32 array.
+        Windows run across year ends; NaN months are skipped and a window with fewer than
+        min_periods (default window) values is NaN. Counties go block at a time to bound memory.
+        """
+        min_periods = window if min_periods is None else min_periods
+        series = self._values[variable].reshape(len(self.years) * 12, -1)
+        out = np.empty(series.shape, dtype=np.float32)
+        for start in range(0, series.shape[1], block):
+            part = np.asarray(series[:, start:start + block], dtype=np.float64)
+            known = np.isfinite(part)
+            sums = np.cumsum(np.where(known, part, 0.), axis=0)
+            counts = np.cumsum(known, axis=0)
+            sums[window:] -= sums[:-window].copy()
+            counts[window:] -= counts[:-window].copy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[:, start:start + block] = np.where(counts >= max(min_periods, 1), sums / counts, np.nan)
+        return out.reshape(self._values[variable].shape)
+
+    def seasonal(self, variable, months, how='mean'):
+        """
+        (years, counties) reduction ('mean', 'min', 'max' or 'sum') over the given months of each year.
+        NaN where a county has no value in those months, and for 'sum' where any month is missing.
+        """
+        reduce = {'mean': np.nanmean, 'min': np.nanmin, 'max': np.nanmax, 'sum': np.sum}[how]
+        selected = np.asarray(self._values[variable][:, np.asarray(months) - 1, :])
+        with warnings.catch_warnings():
+            # all-NaN counties (missing files) are expected
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return reduce(selected, axis=1)
+
+def regime_inputs(cube):
+    """
+    The analysis columns for every year at once, each (years, counties): calendar-year HDD/CDD
+    from the monthly degree days, MIN TEMP over Jan/Feb/Dec, MAX TEMP over Jun/Jul/Aug.
+    """
+    hdd = cube.seasonal('hdd', MONTHS, 'sum')
+    cdd = cube.seasonal('cdd', MONTHS, 'sum')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        hdd_per_cdd = hdd / cdd
+    return {
+        'HDD': hdd,
+        'CDD': cdd,
+        'HDD_per_CDD': hdd_per_cdd,
+        'MIN TEMP': cube.seasonal('tmin', [1, 2, 12], 'min'),
+        'MAX TEMP': cube.seasonal('tmax', [6, 7, 8], 'max'),
+    }
+
+def classify_years(cube, thresholds=None, regimes=None):
+    """
+    Regime name -> (years, counties) int8 codes, one regimes.classify call over all years.
+    """
+    inputs = regime_inputs(cube)
+    shape = inputs['HDD'].shape
+    codes = classify({name: values.ravel() for name, values in inputs.items()}, thresholds, regimes)
+    return {name: code.reshape(shape) for name, code in codes.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the year x month x county climate cube.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--store', default='data/noaa', help="fetched monthly files, relative to --parent (see greenroof.py fetch)")
+    parser.add_argument('--cube', default='data/cache/cube', help="cube directory, relative to --parent")
+    parser.add_argument('--build', action='store_true', help="load new or changed monthly files into the cube")
+    parser.add_argument('--variables', nargs='+', default=['tavg', 'tmax', 'tmin', 'pcp', 'hdd', 'cdd', 'pmdi'])
+    parser.add_argument('--years', default='1895-2025')
+    parser.add_argument('--county', type=int, metavar='GEOID', help="print one county's history")
+    parser.add_argument('--month', metavar='YYYY-MM', help="print one month across counties")
+    parser.add_argument('--regimes', action='store_true', help="print advisable county counts per year")
+    args = parser.parse_args()
+
+    parent_path = Path(args.parent)
+    cube_dir = parent_path / args.cube
+    if args.build:
+        geoids = pd.read_csv(parent_path / 'data/continental.csv', usecols=['GEOID'])['GEOID']
+        loaded = build_cube(parent_path / args.store, cube_dir, geoids, args.variables, parse_years(args.years))
+        print(f"Loaded {loaded} files into {cube_dir}")
+    cube = Cube(cube_dir)
+    if args.county:
+        print(cube.county(args.county).dropna(how='all').to_string())
+    if args.month:
+        year, month = (int(part) for part in args.month.split('-'))
+        print(cube.month(year, month).describe().to_string())
+    if args.regimes:
+        codes = classify_years(cube, regimes=['GREEN ROOF', 'COOL ROOF'])
+        table = pd.DataFrame({name: (code > 0).sum(axis=1) for name, code in codes.items()}, index=cube.years)
+        print(table.to_string())
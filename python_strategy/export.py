@@ -0,0 +1,161 @@
+from pathlib import Path
+import os
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from geoid import geoid_dtype
+from geometry_cache import CONTINENTAL_CRS, geoparquet_metadata
+
+# regime flags/levels are stored as int8 codes
+REGIME_COLUMNS = ['GREEN ROOF', 'COOL ROOF', 'roof_regime']
+# census code columns stay integers; every other number is a measure
+CODE_COLUMNS = ['GEOID', 'STATEFP', 'COUNTYFP', 'TRACTCE', 'BLKGRPCE']
+
+def export_paths(output_path):
+    """
+    all_data.parquet -> (attribute table path, geometry table path).
+    """
+    output_path = Path(output_path)
+    return output_path, output_path.with_name(output_path.stem + '_geometry.parquet')
+
+def compact_attributes(all_data, geoid_type=None):
+    """
+    Attribute columns of all_data with int32 GEOID (int64 below county level), float32 measures
+    and int8 regime codes. geoid_type pins the GEOID dtype, e.g. when writing in chunks.
+    Whole-number measures (HDD, CDD) are loaded as int64 so the csv keeps them as the source
+    files have them; they are float32 here too as long as float32 holds them exactly.
+    """
+    attributes = pd.DataFrame(all_data.drop(columns='geometry', errors='ignore'))
+    for column in attributes.columns:
+        if column == 'GEOID':
+            attributes[column] = attributes[column].astype(geoid_type or geoid_dtype(attributes[column]))
+        elif column in REGIME_COLUMNS:
+            attributes[column] = attributes[column].astype(np.int8)
+        elif pd.api.types.is_float_dtype(attributes[column]):
+            attributes[column] = attributes[column].astype(np.float32)
+        elif (column not in CODE_COLUMNS and pd.api.types.is_integer_dtype(attributes[column])
+              and attributes[column].abs().max() <= 2 ** 24):
+            attributes[column] = attributes[column].astype(np.float32)
+    return attributes
+
+class AllDataWriter:
+    """
+    Writes all_data one chunk at a time in either export format, e.g.
+
+        with AllDataWriter(parent_path / 'data/all_data', 'csv') as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+
+    Everything goes to .tmp files that are renamed on close, so readers never see a partial export.
+    """
+    def __init__(self, output_path, export_format='parquet', geoid_type=None):
+        if export_format not in ('parquet', 'csv'):
+            raise ValueError("export_format must be 'parquet' or 'csv', got " + repr(export_format))
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.export_format = export_format
+        self.geoid_type = geoid_type
+        if export_format == 'csv':
+            self.csv_path = output_path.with_suffix('.csv')
+        else:
+            self.attributes_path, self.geometry_path = export_paths(output_path.with_suffix('.parquet'))
+        self.rows = 0
+        self.paths = []
+        self._writers = {}
+        self._written = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._abort()
+        return False
+
+    def _tmp(self, path):
+        return path.with_name(path.name + '.tmp')
+
+    def _append(self, path, table):
+        writer = self._writers.get(path)
+        if writer is None:
+            writer = self._writers[path] = pq.ParquetWriter(self._tmp(path), table.schema, compression='zstd')
+            self._written.append(path)
+        else:
+            table = table.cast(writer.schema)
+        writer.write_table(table)
+
+    def write(self, chunk):
+        if self.export_format == 'csv':
+            first = not self._written
+            chunk.to_csv(self._tmp(self.csv_path), mode='w' if first else 'a', header=first, index=False)
+            if first:
+                self._written.append(self.csv_path)
+            self.rows += len(chunk)
+            return
+
+        attributes = compact_attributes(chunk, self.geoid_type)
+        self._append(self.attributes_path, pa.Table.from_pandas(attributes, preserve_index=False))
+        if 'geometry' in chunk:
+            geometry = pa.table({
+                'GEOID': pa.array(attributes['GEOID'].to_numpy()),
+                'geometry': pa.array(shapely.to_wkb(np.asarray(chunk.geometry)), pa.binary()),
+            })
+            metadata = {b'geo': geoparquet_metadata(str(chunk.crs or CONTINENTAL_CRS))}
+            self._append(self.geometry_path, geometry.replace_schema_metadata(metadata))
+        self.rows += len(chunk)
+
+    def close(self):
+        """
+        Finishes every file and moves it into place. Returns the paths written.
+        """
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+        for path in self._written:
+            os.replace(self._tmp(path), path)
+        self.paths, self._written = self._written, []
+        return self.paths
+
+    def _abort(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+        for path in self._written:
+            self._tmp(path).unlink(missing_ok=True)
+        self._written = []
+
+def write_all_data(all_data, output_path, export_format='parquet'):
+    """
+    Writes the analysed county data. 'parquet' writes the compact attribute table and a separate
+    GEOID + WKB geometry table (zstd compressed); 'csv' writes the old all_data.csv with WKT geometry.
+    Returns the paths written.
+    """
+    writer = AllDataWriter(output_path, export_format)
+    writer.write(all_data)
+    return writer.close()
+
+def read_all_data(output_path, columns=None, geometry=False):
+    """
+    Reads an exported all_data.parquet, loading only the requested columns (GEOID is always kept).
+    With geometry=True the geometry table is joined back on GEOID and a GeoDataFrame is returned.
+    """
+    attributes_path, geometry_path = export_paths(Path(output_path).with_suffix('.parquet'))
+    if columns is not None:
+        columns = ['GEOID'] + [c for c in columns if c not in ('GEOID', 'geometry')]
+    all_data = pq.read_table(attributes_path, columns=columns, memory_map=True).to_pandas()
+    if not geometry:
+        return all_data
+
+    table = pq.read_table(geometry_path, memory_map=True)
+    geoids = table.column('GEOID').to_numpy()
+    shapes = shapely.from_wkb(table.column('geometry').to_numpy())
+    # the geometry table is written in the same row order, so align by position unless it differs
+    if not np.array_equal(geoids, all_data['GEOID'].to_numpy()):
+        order = pd.Series(np.arange(len(geoids)), index=geoids)
+        shapes = shapes[order.loc[all_data['GEOID']].to_numpy()]
+    return gpd.GeoDataFrame(all_data, geometry=shapes, crs=CONTINENTAL_CRS)
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+STATE_TO_FIPS = {
+    'AL': 1, 'AK': 2, 'AZ': 4, 'AR': 5, 'CA': 6, 'CO': 8,
+    'CT': 9, 'DE': 10, 'FL': 12, 'GA': 13, 'HI': 15, 'ID': 16,
+    'IL': 17, 'IN': 18, 'IA': 19, 'KS': 20, 'KY': 21, 'LA': 22,
+    'ME': 23, 'MD': 24, 'MA': 25, 'MI': 26, 'MN': 27, 'MS': 28,
+    'MO': 29, 'MT': 30, 'NE': 31, 'NV': 32, 'NH': 33, 'NJ': 34,
+    'NM': 35, 'NY': 36, 'NC': 37, 'ND': 38, 'OH': 39, 'OK': 40,
+    'OR': 41, 'PA': 42, 'RI': 44, 'SC': 45, 'SD': 46, 'TN': 47,
+    'TX': 48, 'UT': 49, 'VT': 50, 'VA': 51, 'WA': 53, 'WV': 54,
+    'WI': 55, 'WY': 56, 'DC': 11
+}
+
+# 26 x 26 table indexed by the two prefix letters, -1 where there is no state
+_FIPS_TABLE = np.full(26 * 26, -1, dtype=np.int32)
+for _abbr, _fips in STATE_TO_FIPS.items():
+    _FIPS_TABLE[(ord(_abbr[0]) - 65) * 26 + (ord(_abbr[1]) - 65)] = _fips
+
+def encode_geoids(ids):
+    """
+    Converts a whole column of IDs from 'LL-###' (e.g., 'AL-001') to int32 FIPS (e.g., 1001).
+    Returns (codes, unknown); rows with an unknown state prefix or a county part that is not
+    all digits get -1, and unknown lists those prefixes and malformed IDs.
+    """
+    raw = np.asarray(pd.Series(ids, copy=False).astype(str).to_numpy(), dtype='U')
+    n = len(raw)
+    if n == 0:
+        return np.empty(0, dtype=np.int32), []
+    width = raw.dtype.itemsize // 4
+    # one code point per cell; anything outside ASCII becomes DEL, which is neither letter nor digit
+    chars = raw.view(np.uint32).reshape(n, width).astype(np.int32)
+    chars[chars > 127] = 127
+
+    # Get LL, upper-cased by clearing the ASCII lowercase bit
+    first = (chars[:, 0] & 0xDF) - 65
+    second = (chars[:, 1] & 0xDF) - 65 if width > 1 else np.full(n, -1, np.int32)
+    is_letter = (first >= 0) & (first < 26) & (second >= 0) & (second < 26)
+    state = np.full(n, -1, dtype=np.int32)
+    state[is_letter] = _FIPS_TABLE[first[is_letter] * 26 + second[is_letter]]
+
+    # Get ### - everything after the separator, short IDs are null padded
+    county = np.zeros(n, dtype=np.int32)
+    malformed = np.zeros(n, dtype=bool)
+    for col in range(3, width):
+        digit = chars[:, col] - 48
+        is_digit = (digit >= 0) & (digit <= 9)
+        malformed |= ~is_digit & (chars[:, col] != 0)
+        county = np.where(is_digit, county * 10 + digit, county)
+    malformed &= state >= 0
+
+    codes = np.where((state >= 0) & ~malformed, state * 1000 + county, -1).astype(np.int32)
+
+    unknown = []
+    if (state < 0).any():
+        prefixes = np.unique(raw[state < 0].astype('U2'))
+        unknown = [p.upper() for p in prefixes]
+    if malformed.any():
+        unknown += np.unique(raw[malformed]).tolist()
+    return codes, unknown
+
+def convert_geoid_data_to_number(temp_df, id_str):
+    """
+    Replaces the id_str column with int32 FIPS codes in one pass.
+    Rows with an unknown state prefix or a malformed county part are reported once and dropped.
+    """
+    codes, unknown = encode_geoids(temp_df[id_str])
+    temp_df[id_str] = codes
+    if unknown:
+        print("Warning: dropping rows with unknown state prefixes or malformed IDs: " + ", ".join(unknown))
+        temp_df = temp_df.loc[codes >= 0]
+    return temp_df # MUST return the dataframe
+
+# digits after the 2-digit state FIPS in each kind of census GEOID
+RESOLUTIONS = {'county': 3, 'tract': 9, 'block group': 10}
+
+def geoid_dtype(geoids):
+    """
+    int32 while every GEOID fits (counties), int64 for tract and block group GEOIDs.
+    """
+    geoids = np.asarray(geoids)
+    if len(geoids) and geoids.max() > np.iinfo(np.int32).max:
+        return np.int64
+    return np.int32
+
+def state_of(geoids, resolution='county'):
+    """
+    State FIPS of numeric GEOIDs at the given resolution (e.g., 1001 -> 1 for counties).
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError("resolution must be one of " + ", ".join(RESOLUTIONS) + ", got " + repr(resolution))
+    return np.asarray(geoids, dtype=np.int64) // 10 ** RESOLUTIONS[resolution]
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from geoid import geoid_dtype
+
+def _value_columns(source):
+    return [c for c in source.columns if c != 'GEOID']
+
+def _fill_dtype(dtype):
+    # outer joins leave holes, so integer columns need a float to hold NaN
+    return dtype if np.issubdtype(dtype, np.floating) else np.result_type(dtype, np.float32)
+
+def align_on_geoid(sources, how='inner', index=None):
+    """
+    Aligns any number of GEOID/value frames onto one sorted GEOID index in a single pass.
+    how='inner' keeps counties present in every source, how='outer' keeps all of them.
+    If index is given (e.g. continental['GEOID']) it is used as the county universe.
+    Returns (aligned, coverage) where coverage maps each source's columns to the GEOIDs it is missing.
+    """
+    if how not in ('inner', 'outer'):
+        raise ValueError("how must be 'inner' or 'outer', got " + repr(how))
+    keys = [np.asarray(source['GEOID'], dtype=np.int64) for source in sources]
+    for source, key in zip(sources, keys):
+        if len(np.unique(key)) != len(key):
+            raise ValueError("Duplicate GEOIDs in source " + ", ".join(_value_columns(source)))
+
+    if index is None:
+        geoids = np.unique(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+    else:
+        geoids = np.unique(np.asarray(index, dtype=np.int64))
+
+    # position of every source row in the shared index, -1 when outside it
+    present = np.zeros((len(sources), len(geoids)), dtype=bool)
+    positions = []
+    for i, key in enumerate(keys):
+        pos = np.searchsorted(geoids, key)
+        pos[pos == len(geoids)] = 0
+        hit = geoids[pos] == key if len(geoids) else np.zeros(len(key), dtype=bool)
+        pos = np.where(hit, pos, -1)
+        present[i, pos[hit]] = True
+        positions.append(pos)
+
+    coverage = {}
+    for i, source in enumerate(sources):
+        coverage[", ".join(_value_columns(source))] = geoids[~present[i]]
+
+    keep = present.all(axis=0) if how == 'inner' else np.ones(len(geoids), dtype=bool)
+    row_of = np.full(len(geoids), -1, dtype=np.int64)
+    row_of[keep] = np.arange(keep.sum())
+
+    columns = {'GEOID': geoids[keep].astype(geoid_dtype(geoids))}
+    names = [name for source in sources for name in _value_columns(source)]
+    if len(set(names)) != len(names):
+        raise ValueError("Sources share value column names: " + ", ".join(names))
+    n_rows = int(keep.sum())
+    for source, pos in zip(sources, positions):
+        rows = row_of[pos[pos >= 0]]
+        valid = rows >= 0
+        src_rows = np.flatnonzero(pos >= 0)[valid]
+        for name in _value_columns(source):
+            values = source[name].to_numpy()
+            if how == 'inner':
+                # every kept row is present in every source, so nothing is left unfilled
+                out = np.empty(n_rows, dtype=values.dtype)
+            else:
+                out = np.full(n_rows, np.nan, dtype=_fill_dtype(values.dtype))
+            out[rows[valid]] = values[src_rows]
+            columns[name] = out
+    return pd.DataFrame(columns), coverage
+
+def print_coverage(coverage):
+    for name, missing in coverage.items():
+        if len(missing):
+            print(f"Warning: {name} is missing {len(missing)} counties, e.g. {missing[:5].tolist()}")
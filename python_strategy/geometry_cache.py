@@ -0,0 +1,204 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+from pyproj import CRS
+
+CONTINENTAL_CRS = "EPSG:5070"
+CACHE_VERSION = 1
+_META_KEY = b'greenroof'
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def default_cache_path(continental_path):
+    continental_path = Path(continental_path)
+    return continental_path.parent / 'cache' / (continental_path.stem + '.parquet')
+
+def source_key(source_path, sha256=None, writer='frame'):
+    """
+    writer tells write_geometry_cache ('frame') and write_geometry_cache_chunked ('chunked') files apart.
+    """
+    stat = os.stat(source_path)
+    return {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256, 'crs': CONTINENTAL_CRS, 'writer': writer}
+
+def hashed_source_key(source_path, cached=None):
+    """
+    source_key with the sha256 filled in, reused from cached (an earlier source_key of the same
+    path) when size and mtime still match it, so unchanged files are not read again.
+    """
+    key = source_key(source_path)
+    if cached and cached.get('size') == key['size'] and cached.get('mtime_ns') == key['mtime_ns']:
+        key['sha256'] = cached['sha256']
+    else:
+        key['sha256'] = file_sha256(source_path)
+    return key
+
+def _read_cache_key(cache_path):
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if _META_KEY not in metadata:
+        return None
+    return json.loads(metadata[_META_KEY])
+
+def _stamp_path(cache_path):
+    cache_path = Path(cache_path)
+    return cache_path.with_name(cache_path.name + '.stamp')
+
+def source_unchanged(source_path, cached, cache_path):
+    """
+    True when source_path is still the file whose source_key (size, mtime_ns, sha256) the cache
+    at cache_path was built from. Checks size/mtime first and only hashes the source when those
+    changed; a touched but identical file gets its new mtime stamped next to the cache, so later
+    runs are back on the fast path.
+    """
+    current = source_key(source_path)
+    if cached['size'] != current['size']:
+        return False
+    if cached['mtime_ns'] == current['mtime_ns']:
+        return True
+    stamp_path = _stamp_path(cache_path)
+    stamp = {'sha256': cached['sha256'], 'size': current['size'], 'mtime_ns': current['mtime_ns']}
+    try:
+        if json.loads(stamp_path.read_text()) == stamp:
+            return True
+    except (OSError, ValueError):
+        pass
+    if cached['sha256'] != file_sha256(source_path):
+        return False
+    try:
+        tmp_path = stamp_path.with_name(stamp_path.name + '.tmp')
+        tmp_path.write_text(json.dumps(stamp))
+        os.replace(tmp_path, stamp_path)
+    except OSError:
+        # a read-only cache still works, it just hashes again next time
+        pass
+    return True
+
+def is_cache_valid(continental_path, cache_path, writer='frame'):
+    """
+    Checks size/mtime first and only hashes the source when those changed,
+    so a touched but identical continental.csv keeps its cache. A cache from the
+    other writer (see source_key) is not valid, its column dtypes can differ.
+    """
+    cached = _read_cache_key(cache_path)
+    if cached is None or cached.get('version') != CACHE_VERSION or cached.get('writer') != writer:
+        return False
+    return source_unchanged(continental_path, cached, cache_path)
+
+def geoparquet_metadata(crs=CONTINENTAL_CRS):
+    """
+    The GeoParquet 'geo' schema metadata for a WKB 'geometry' column, so geopandas can read our files.
+    """
+    geo = {'version': '1.0.0', 'primary_column': 'geometry',
+           'columns': {'geometry': {'encoding': 'WKB', 'geometry_types': [],
+                                    'crs': CRS(crs).to_json_dict()}}}
+    return json.dumps(geo).encode()
+
+def write_geometry_cache(continental, continental_path, cache_path):
+    """
+    Writes a GeoDataFrame as GeoParquet: attributes as columns, geometry as WKB.
+    """
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    attributes = pd.DataFrame(continental.drop(columns='geometry'))
+    table = pa.Table.from_pandas(attributes, preserve_index=False)
+    table = table.append_column('geometry', pa.array(shapely.to_wkb(np.asarray(continental.geometry)), pa.binary()))
+
+    key = source_key(continental_path, file_sha256(continental_path))
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'geo'] = geoparquet_metadata()
+    metadata[_META_KEY] = json.dumps(key).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # write next to the target and rename so readers never see a partial file
+    tmp_path = cache_path.with_suffix(cache_path.suffix + '.tmp')
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, cache_path)
+
+def write_geometry_cache_chunked(continental_path, cache_path, chunksize=50000):
+    """
+    Same cache as write_geometry_cache, but parses the WKT chunksize rows at a time, so tract and
+    block group files never have to fit in memory as geometry. The attribute columns are read
+    whole first (they are small next to the WKT), so every chunk is written with the dtypes of
+    the full column rather than whatever its own rows happen to look like.
+    """
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(cache_path.suffix + '.tmp')
+    key = source_key(continental_path, file_sha256(continental_path), writer='chunked')
+    header = pd.read_csv(continental_path, nrows=0).columns
+    attributes = pd.read_csv(continental_path, usecols=[c for c in header if c != 'geometry'],
+                             dtype={'GEOID': np.int64})
+    schema = pa.Schema.from_pandas(attributes, preserve_index=False)
+    metadata = dict(schema.metadata or {})
+    metadata[b'geo'] = geoparquet_metadata()
+    metadata[_META_KEY] = json.dumps(key).encode()
+    schema = schema.append(pa.field('geometry', pa.binary())).with_metadata(metadata)
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            start = 0
+            for chunk in pd.read_csv(continental_path, usecols=['geometry'], chunksize=chunksize):
+                wkb = shapely.to_wkb(shapely.from_wkt(chunk['geometry'].to_numpy()))
+                part = attributes.iloc[start:start + len(chunk)]
+                arrays = [pa.array(part[field.name], field.type, from_pandas=True) for field in schema if field.name != 'geometry']
+                writer.write_table(pa.Table.from_arrays(arrays + [pa.array(wkb, pa.binary())], schema=schema))
+                start += len(chunk)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def _to_geodataframe(table):
+    geometry = shapely.from_wkb(table.column('geometry').to_numpy())
+    attributes = table.drop(['geometry']).to_pandas()
+    return gpd.GeoDataFrame(attributes, geometry=geometry, crs=CONTINENTAL_CRS)
+
+def read_geometry_cache(cache_path, columns=None):
+    """
+    Memory-maps the cache and rebuilds every geometry in one shapely.from_wkb call.
+    """
+    if columns is not None:
+        columns = [c for c in columns if c != 'geometry'] + ['geometry']
+    return _to_geodataframe(pq.read_table(cache_path, columns=columns, memory_map=True))
+
+def iter_geometry_cache(cache_path, batch_size=50000, columns=None):
+    """
+    Yields the cache as GeoDataFrames of at most batch_size rows, in file order.
+    """
+    if columns is not None:
+        columns = [c for c in columns if c != 'geometry'] + ['geometry']
+    parquet_file = pq.ParquetFile(cache_path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield _to_geodataframe(pa.Table.from_batches([batch]))
+
+def parse_continental(continental_path):
+    continental = pd.read_csv(continental_path)
+    geometry = shapely.from_wkt(continental.pop('geometry').to_numpy())
+    return gpd.GeoDataFrame(continental, geometry=geometry, crs=CONTINENTAL_CRS)
+
+def load_continental(continental_path, cache_path=None, refresh=False):
+    """
+    Returns continental.csv as an EPSG:5070 GeoDataFrame, parsing the WKT only
+    when the cache is missing or the source file has changed.
+    """
+    cache_path = Path(cache_path) if cache_path else default_cache_path(continental_path)
+    if not refresh and cache_path.exists() and is_cache_valid(continental_path, cache_path):
+        return read_geometry_cache(cache_path)
+    print("Building geometry cache " + str(cache_path))
+    continental = parse_continental(continental_path)
+    write_geometry_cache(continental, continental_path, cache_path)
+    return continental
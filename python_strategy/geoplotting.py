@@ -7,6 +7,103 @@ import pandas as pd
 import os
 import numpy as np
 from shapely import wkt
+from shapely.geometry.polygon import orient
+from matplotlib.collections import PatchCollection
+from matplotlib.patches import Patch, PathPatch
+from matplotlib.path import Path as MplPath
+
+def _polygon_path(geom):
+    """
+    One compound matplotlib path per (Multi)Polygon, exterior rings counter-clockwise
+    and holes clockwise so matplotlib fills them correctly.
+    """
+    parts = [geom] if geom.geom_type == 'Polygon' else geom.geoms
+    rings = []
+    for part in parts:
+        part = orient(part)
+        rings.append(MplPath(np.asarray(part.exterior.coords)[:, :2], closed=True))
+        rings += [MplPath(np.asarray(r.coords)[:, :2], closed=True) for r in part.interiors]
+    return MplPath.make_compound_path(*rings)
+
+def category_colors(names, colors_list, categories=None):
+    """
+    Category name -> RGBA for a categorical map, ordered by name like
+    GeoDataFrame.plot(categorical=True). categories fixes the set (default the names present).
+    """
+    categories = sorted(categories if categories is not None else pd.Series(names).dropna().unique())
+    palette = colors.ListedColormap(colors_list)
+    return {name: palette(i / max(len(categories) - 1, 1)) for i, name in enumerate(categories)}
+
+def category_legend(ax, rgba, title="Advisability"):
+    handles = [Patch(facecolor=color, edgecolor='black', linewidth=0.05, label=name) for name, color in rgba.items()]
+    return ax.legend(handles=handles, loc='lower right', title=title)
+
+class BaseMap:
+    """
+    County polygons drawn once; each render() only swaps face colors, colorbar/legend and title.
+    """
+    def __init__(self, all_data, figsize=(10, 6)):
+        self.all_data = all_data
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        patches = [PathPatch(_polygon_path(geom)) for geom in all_data.geometry]
+        self.collection = PatchCollection(patches, edgecolor='black', linewidth=0.05)
+        self.ax.add_collection(self.collection)
+        minx, miny, maxx, maxy = all_data.total_bounds
+        self.ax.set_xlim(minx, maxx)
+        self.ax.set_ylim(miny, maxy)
+        self.ax.set_aspect('equal')
+        self.ax.set_axis_off()
+        self.colorbar = None
+        self.legend = None
+
+    def _values(self, column):
+        return self.all_data[column] if isinstance(column, str) else pd.Series(column)
+
+    def render(self, column, cmap='RdYlBu_r', norm=None, title=None, label=None):
+        """
+        Recolors the counties by a continuous column (or array) with a colorbar.
+        """
+        values = np.ma.masked_invalid(np.asarray(self._values(column), dtype=float))
+        self.collection.set_array(values)
+        self.collection.set_cmap(cmap)
+        self.collection.set_norm(norm if norm is not None else colors.Normalize(values.min(), values.max()))
+        if self.legend is not None:
+            self.legend.remove()
+            self.legend = None
+        if self.colorbar is None:
+            self.colorbar = self.fig.colorbar(self.collection, ax=self.ax, orientation="horizontal")
+        else:
+            self.colorbar.update_normal(self.collection)
+            self.colorbar.ax.set_visible(True)
+        self.colorbar.set_label(label or "")
+        self.ax.set_title(title or "", fontsize=20)
+        return self
+
+    def render_categorical(self, column, labels, colors_list, title=None, legend_title="Advisability", categories=None):
+        """
+        Recolors the counties by integer codes mapped through labels, with a category legend.
+        Categories are ordered by label name, matching GeoDataFrame.plot(categorical=True).
+        categories fixes the legend and colors (e.g. every label, for frames of an animation)
+        instead of using the names present.
+        """
+        names = self._values(column).astype(int).map(labels)
+        rgba = category_colors(names, colors_list, categories)
+        self.collection.set_array(None)
+        self.collection.set_facecolor([rgba.get(name, (0, 0, 0, 0)) for name in names])
+        if self.colorbar is not None:
+            self.colorbar.ax.set_visible(False)
+        if self.legend is not None:
+            self.legend.remove()
+        self.legend = category_legend(self.ax, rgba, legend_title)
+        self.ax.set_title(title or "", fontsize=20)
+        return self
+
+    def save(self, output_path, dpi=300):
+        self.fig.savefig(output_path, dpi=dpi, bbox_inches='tight')
+        print("Map saved")
+
+    def close(self):
+        plt.close(self.fig)
 
 def plot_cool_roof_regime(all_data, parent_path):
     if all_data.empty:
@@ -112,102 +209,35 @@ def plot_hdd_per_cdd(all_data, parent_path):
 def plot_min_temp(all_data, parent_path):
     divnorm = colors.TwoSlopeNorm(vmin=-30., vcenter=20., vmax=70.)
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    all_data.plot(
-        column='MIN TEMP', 
-        ax=ax, 
-        cmap='RdYlBu_r', 
-        norm=divnorm,
-        legend=True,
-        legend_kwds={'label': "2025 Minimum Temperature", 'orientation': "horizontal"},
-        edgecolor='black', 
-        linewidth=0.05
-    )
-
-    ax.set_axis_off()
-    plt.title("2025 Minimum Temperature by County", fontsize=20)
-    
-    plt.savefig(parent_path / 'image/min_temp.png', dpi=300, bbox_inches='tight')
-    print("Map saved")
-    plt.show()
+    # draw the counties once and only recolor them per map
+    base_map = BaseMap(all_data, figsize=(10, 6))
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    all_data.plot(
-        column='MIN TEMP JAN', 
-        ax=ax, 
-        cmap='RdYlBu_r', 
-        norm=divnorm,
-        legend=True,
-        legend_kwds={'label': "January 2025 Minimum Temperature", 'orientation': "horizontal"},
-        edgecolor='black', 
-        linewidth=0.05
-    )
+    base_map.render('MIN TEMP', norm=divnorm, label="2025 Minimum Temperature",
+                    title="2025 Minimum Temperature by County")
+    base_map.save(parent_path / 'image/min_temp.png')
 
-    ax.set_axis_off()
-    plt.title("January 2025 Minimum Temperature by County", fontsize=20)
-    
-    plt.savefig(parent_path / 'image/min_temp_jan.png', dpi=300, bbox_inches='tight')
-    print("Map saved")
+    base_map.render('MIN TEMP JAN', norm=divnorm, label="January 2025 Minimum Temperature",
+                    title="January 2025 Minimum Temperature by County")
+    base_map.save(parent_path / 'image/min_temp_jan.png')
     plt.show()
 
 def plot_max_temp(all_data, parent_path):
     divnorm = colors.TwoSlopeNorm(vmin=60., vcenter=90., vmax=120.)
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    all_data.plot(
-        column='MAX TEMP', 
-        ax=ax, 
-        cmap='RdYlBu_r', 
-        norm=divnorm,
-        legend=True,
-        legend_kwds={'label': "2025 Maximum Temperature", 'orientation': "horizontal"},
-        edgecolor='black', 
-        linewidth=0.05
-    )
+    # draw the counties once and only recolor them per map
+    base_map = BaseMap(all_data, figsize=(10, 6))
 
-    ax.set_axis_off()
-    plt.title("2025 Maximum Temperature by County", fontsize=20)
-    
-    plt.savefig(parent_path / 'image/max_temp.png', dpi=300, bbox_inches='tight')
-    print("Map saved")
-    plt.show()
+    base_map.render('MAX TEMP', norm=divnorm, label="2025 Maximum Temperature",
+                    title="2025 Maximum Temperature by County")
+    base_map.save(parent_path / 'image/max_temp.png')
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    all_data.plot(
-        column='MAX TEMP JUL', 
-        ax=ax, 
-        cmap='RdYlBu_r', 
-        norm=divnorm,
-        legend=True,
-        legend_kwds={'label': "July 2025 Maximum Temperature", 'orientation': "horizontal"},
-        edgecolor='black', 
-        linewidth=0.05
-    )
+    base_map.render('MAX TEMP JUL', norm=divnorm, label="July 2025 Maximum Temperature",
+                    title="July 2025 Maximum Temperature by County")
+    base_map.save(parent_path / 'image/max_temp_july.png')
 
-    ax.set_axis_off()
-    plt.title("July 2025 Maximum Temperature by County", fontsize=20)
-    
-    plt.savefig(parent_path / 'image/max_temp_july.png', dpi=300, bbox_inches='tight')
-    print("Map saved")
-    plt.show()
-
-    fig, ax = plt.subplots(figsize=(10, 6))
-    all_data.plot(
-        column='MAX TEMP AUG', 
-        ax=ax, 
-        cmap='RdYlBu_r', 
-        norm=divnorm,
-        legend=True,
-        legend_kwds={'label': "August 2025 Maximum Temperature", 'orientation': "horizontal"},
-        edgecolor='black', 
-        linewidth=0.05
-    )
-
-    ax.set_axis_off()
-    plt.title("August 2025 Maximum Temperature by County", fontsize=20)
-    
-    plt.savefig(parent_path / 'image/max_temp_aug.png', dpi=300, bbox_inches='tight')
-    print("Map saved")
+    base_map.render('MAX TEMP AUG', norm=divnorm, label="August 2025 Maximum Temperature",
+                    title="August 2025 Maximum Temperature by County")
+    base_map.save(parent_path / 'image/max_temp_aug.png')
     plt.show()
 
 def plot_drought(all_data, parent_path):
@@ -0,0 +1,293 @@
+from pathlib import Path
+import argparse
+import subprocess
+import sys
+
+# Single entry point for cron and shell use: python greenroof.py <command> --help
+# Only argparse is imported up front; every command imports what it needs when it runs,
+# and `startup` checks that stays true.
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# modules a command must never pull in ('cli' is the bare entry point, e.g. --help)
+FORBIDDEN_IMPORTS = {
+    'cli': ['numpy', 'pandas', 'pyarrow', 'shapely', 'geopandas', 'matplotlib'],
+    'fetch': ['numpy', 'pandas', 'pyarrow', 'shapely', 'geopandas', 'matplotlib'],
+    'validate': ['shapely', 'geopandas', 'matplotlib'],
+    'analyze': ['matplotlib'],
+    'export': ['matplotlib'],
+}
+
+def _noaa_paths(data_dir):
+    from analysis import NOAA_FILES
+    return [(name, Path(data_dir) / Path(path).name) for name, path in NOAA_FILES]
+
+def cmd_fetch(args):
+    """
+    Downloads the Climate at a Glance county files into --data-dir (or --store), concurrently
+    and only where the server has a newer copy. Exits 1 when a download failed.
+    """
+    import noaa_fetch
+    if args.imports_only:
+        return 0
+
+    unknown = set(args.parameter or []) - set(noaa_fetch.PARAMETERS)
+    if unknown:
+        print("Unknown parameter " + ", ".join(sorted(unknown)) + "; use " + ", ".join(noaa_fetch.PARAMETERS))
+        return 1
+    if args.parameter:
+        series = noaa_fetch.series_matrix(args.parameter, noaa_fetch.parse_years(args.years),
+                                          args.months or range(1, 13), args.window)
+    else:
+        series = noaa_fetch.DEFAULT_SERIES
+    results = noaa_fetch.fetch_all(series, args.store or args.data_dir,
+                                   args.base_url or noaa_fetch.BASE_URL, args.workers, force=args.force)
+    counts = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+        if result.status == 'failed':
+            print(f"Failed {result.series.path}: {result.error}")
+        elif args.verbose or result.status == 'downloaded':
+            print(f"{result.status:<10} {result.series.path} ({result.bytes} bytes)")
+    print(", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "Nothing to fetch")
+    return 1 if counts.get('failed') else 0
+
+def cmd_validate(args):
+    """
+    Loads every NOAA file and continental.csv's GEOIDs and reports anything that would make
+    the analysis drop or mix up counties. Exits 1 when a problem was found.
+    """
+    import pandas as pd
+    from noaa_loader import load_noaa_files
+    from geoid_join import align_on_geoid
+    from analysis import reformat_geodata
+    if args.imports_only:
+        return 0
+
+    data_dir = Path(args.data_dir)
+    problems = []
+    variables = []
+    files = []
+    for name, path in _noaa_paths(data_dir):
+        if path.exists():
+            files.append((name, path))
+        else:
+            problems.append(f"missing {path}")
+    for (name, path), noaa_file in zip(files, load_noaa_files([path for _, path in files])):
+        variable = reformat_geodata(noaa_file.data.copy(), name)
+        duplicates = variable['GEOID'].duplicated().sum()
+        empty = variable[name].isna().sum()
+        if duplicates:
+            problems.append(f"{name}: {duplicates} duplicate counties")
+        if empty:
+            problems.append(f"{name}: {empty} counties without a value")
+        variables.append(variable)
+        print(f"{name:<18} {len(variable):>6} counties  {noaa_file.meta['title']}")
+
+    continental_path = data_dir / 'continental.csv'
+    if not continental_path.exists():
+        problems.append(f"missing {continental_path}")
+    else:
+        geoids = pd.read_csv(continental_path, usecols=['GEOID'])['GEOID']
+        print(f"{'continental':<18} {len(geoids):>6} counties")
+        if geoids.duplicated().any():
+            problems.append(f"continental: {geoids.duplicated().sum()} duplicate GEOIDs")
+        elif variables:
+            _, coverage = align_on_geoid(variables, how='inner', index=geoids.drop_duplicates())
+            for name, missing in coverage.items():
+                if len(missing):
+                    problems.append(f"{name}: missing {len(missing)} continental counties, e.g. {missing[:5].tolist()}")
+
+    for problem in problems:
+        print("Problem: " + problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    return 1 if problems else 0
+
+def cmd_analyze(args):
+    """
+    NOAA files + continental.csv -> joined, classified all_data export. Never imports matplotlib.
+    """
+    from analysis import build_all_data
+    import instrument
+    if args.imports_only:
+        return 0
+    if args.profile:
+        instrument.enable(args.profile)
+
+    thresholds = {}
+    for item in args.threshold or []:
+        name, _, value = item.partition('=')
+        thresholds[name] = float(value)
+
+    data_dir = Path(args.data_dir)
+    build_all_data(_noaa_paths(data_dir), data_dir / 'continental.csv', thresholds or None, args.fill_missing,
+                   Path(args.output_dir or data_dir) / 'all_data', args.format)
+    return 0
+
+def cmd_render(args):
+    """
+    Draws the geoplotting maps from an all_data export, headless and in parallel.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from export import read_all_data
+    from batch_render import render_batch, geoplotting_specs
+    if args.imports_only:
+        return 0
+
+    specs = geoplotting_specs(image_dir=args.output_dir or Path(args.data_dir).parent / 'image')
+    if args.maps:
+        specs = [spec for spec in specs if spec.column in args.maps or Path(spec.output_path).stem in args.maps]
+        if not specs:
+            print("No map matches " + ", ".join(args.maps))
+            return 1
+    input_path = args.input or Path(args.data_dir) / 'all_data.parquet'
+    if args.raster:
+        from raster_render import load_label_grid, render_raster_map
+        label_grid = load_label_grid(Path(args.data_dir) / 'continental.csv', args.resolution)
+        all_data = read_all_data(input_path, [spec.column for spec in specs])
+        for spec in specs:
+            print("Map saved " + render_raster_map(label_grid, all_data, spec))
+        return 0
+    all_data = read_all_data(input_path, [spec.column for spec in specs], geometry=True)
+    for output_path in render_batch(all_data, specs, args.workers):
+        print("Map saved " + output_path)
+    return 0
+
+def cmd_export(args):
+    """
+    Converts an all_data export to the old csv, TopoJSON or a vector tile pyramid.
+    """
+    from export import read_all_data, write_all_data
+    import web_export
+    if args.imports_only:
+        return 0
+
+    output_dir = Path(args.output_dir or args.data_dir)
+    input_path = args.input or Path(args.data_dir) / 'all_data.parquet'
+    columns = args.columns or web_export.DEFAULT_COLUMNS
+    if args.format == 'csv':
+        paths = write_all_data(read_all_data(input_path, geometry=True), output_dir / 'all_data', 'csv')
+    elif args.format == 'topojson':
+        all_data = read_all_data(input_path, columns, geometry=True)
+        paths = [web_export.write_topojson(all_data, output_dir / 'counties.topojson', columns,
+                                           args.quantization, args.simplify)]
+    else:
+        all_data = read_all_data(input_path, columns, geometry=True)
+        count = web_export.write_vector_tiles(all_data, output_dir / 'tiles', columns, max_zoom=args.max_zoom)
+        print(f"Wrote {count} tiles")
+        paths = [output_dir / 'tiles']
+    for path in paths:
+        print("Data saved " + str(path))
+    return 0
+
+def _import_profile(command):
+    """
+    Runs one command with --imports-only under -X importtime.
+    Returns (total import time in ms, set of top-level packages imported).
+    """
+    argv = [sys.executable, '-X', 'importtime', str(Path(__file__).resolve())]
+    argv += ['--help'] if command == 'cli' else [command, '--imports-only']
+    result = subprocess.run(argv, capture_output=True, text=True)
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        if name.strip() == 'site' and not name[1:].startswith(' '):
+            # everything so far was interpreter start-up (site and its .pth files), not ours
+            total_us, modules = 0, set()
+            continue
+        total_us += int(self_us)
+        modules.add(name.strip().split('.')[0])
+    return total_us / 1000, modules
+
+def cmd_startup(args):
+    """
+    Measures each command's import time and fails (exit 1) if a command imports something it
+    must not or the bare entry point takes longer than --budget-ms to import.
+    """
+    if args.imports_only:
+        return 0
+    failures = []
+    for command in ['cli', 'fetch', 'validate', 'analyze', 'render', 'export']:
+        total_ms, modules = _import_profile(command)
+        forbidden = sorted(set(FORBIDDEN_IMPORTS.get(command, [])) & modules)
+        print(f"{command:<9} {total_ms:8.1f} ms  {len(modules):>4} packages"
+              + ("  imports " + ", ".join(forbidden) if forbidden else ""))
+        if forbidden:
+            failures.append(f"{command} imports {', '.join(forbidden)}")
+        if command == 'cli' and total_ms > args.budget_ms:
+            failures.append(f"entry point imports take {total_ms:.1f} ms, budget {args.budget_ms} ms")
+    for failure in failures:
+        print("Startup regression: " + failure)
+    return 1 if failures else 0
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--data-dir', default=REPO_ROOT / 'data', help="NOAA csvs, continental.csv and all_data")
+    common.add_argument('--imports-only', action='store_true', help=argparse.SUPPRESS)
+
+    parser = argparse.ArgumentParser(prog='greenroof', description="Green and cool roof county analysis.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fetch = commands.add_parser('fetch', parents=[common], help="download the NOAA county files")
+    fetch.add_argument('--store', help="where the files go (default --data-dir)")
+    fetch.add_argument('--base-url', help="Climate at a Glance county mapping URL or a local mirror (default noaa_fetch.BASE_URL)")
+    fetch.add_argument('--parameter', nargs='+', metavar='NAME',
+                       help="tavg, tmax, tmin, pcp, hdd, cdd or pmdi: fetch a parameter x year x month matrix "
+                            "instead of the files the analysis uses")
+    fetch.add_argument('--years', default='2025', help="with --parameter, e.g. 2000-2025 or 2019,2021")
+    fetch.add_argument('--months', nargs='+', type=int, help="with --parameter (default 1-12)")
+    fetch.add_argument('--window', type=int, default=1, help="with --parameter, months each value covers")
+    fetch.add_argument('--workers', type=int, default=8, help="concurrent downloads")
+    fetch.add_argument('--force', action='store_true', help="download even if unchanged")
+    fetch.add_argument('--verbose', action='store_true', help="list unchanged files too")
+    fetch.set_defaults(func=cmd_fetch)
+
+    validate = commands.add_parser('validate', aliases=['load'], parents=[common],
+                                   help="load and check the input files")
+    validate.set_defaults(func=cmd_validate)
+
+    analyze = commands.add_parser('analyze', parents=[common], help="join, classify and write all_data")
+    analyze.add_argument('--output-dir', help="where all_data goes (default --data-dir)")
+    analyze.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    analyze.add_argument('--threshold', action='append', metavar='NAME=VALUE',
+                         help="override a regimes.DEFAULT_THRESHOLDS entry, repeatable")
+    analyze.add_argument('--fill-missing', action='store_true',
+                         help="keep counties missing from a NOAA file, filled with their neighbors' mean")
+    analyze.add_argument('--profile', nargs='?', const='1', help="write per-stage timings as JSON lines")
+    analyze.set_defaults(func=cmd_analyze)
+
+    render = commands.add_parser('render', parents=[common], help="draw the maps from all_data")
+    render.add_argument('--input', help="all_data.parquet (default in --data-dir)")
+    render.add_argument('--output-dir', help="where the PNGs go (default image/ next to --data-dir)")
+    render.add_argument('--maps', nargs='+', help="column or file names to draw, e.g. green_roof 'MIN TEMP'")
+    render.add_argument('--workers', type=int, help="render processes (default one per CPU)")
+    render.add_argument('--raster', action='store_true',
+                        help="draw from the cached county label grid instead of the polygons (fast, no county borders)")
+    render.add_argument('--resolution', type=float, default=2000., help="with --raster, grid cell size in meters")
+    render.set_defaults(func=cmd_render)
+
+    export = commands.add_parser('export', parents=[common], help="convert all_data to other formats")
+    export.add_argument('format', nargs='?', choices=['csv', 'topojson', 'tiles'], default='topojson')
+    export.add_argument('--input', help="all_data.parquet (default in --data-dir)")
+    export.add_argument('--output-dir', help="default --data-dir")
+    export.add_argument('--columns', nargs='+', help="columns for topojson/tiles")
+    export.add_argument('--quantization', type=int, default=100000)
+    export.add_argument('--simplify', type=float, default=0.)
+    export.add_argument('--max-zoom', type=int, default=8)
+    export.set_defaults(func=cmd_export)
+
+    startup = commands.add_parser('startup', parents=[common], help="check import time per command")
+    startup.add_argument('--budget-ms', type=float, default=50., help="import budget for the bare entry point")
+    startup.set_defaults(func=cmd_startup)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
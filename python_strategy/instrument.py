@@ -0,0 +1,184 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+# GREENROOF_PROFILE=<path> appends one JSON line per stage to path ('-' for stderr, '1' for the default file)
+ENV_VAR = 'GREENROOF_PROFILE'
+DEFAULT_PATH = 'greenroof_profile.jsonl'
+
+_sink = None
+_run_id = None
+_lock = threading.Lock()
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def _windows_memory_counters():
+    """
+    GetProcessMemoryInfo for this process, or None if the call fails.
+    """
+    import ctypes
+    from ctypes import wintypes
+
+    class Counters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    kernel32, psapi = ctypes.windll.kernel32, ctypes.windll.psapi
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(Counters), wintypes.DWORD]
+    counters = Counters()
+    counters.cb = ctypes.sizeof(Counters)
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters
+
+def current_rss():
+    """
+    Resident set size in bytes: from psutil when it is installed, else /proc on Linux or
+    GetProcessMemoryInfo on Windows. None where none of these is available (macOS without psutil).
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if sys.platform == 'win32':
+        counters = _windows_memory_counters()
+        return counters.WorkingSetSize if counters else None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def peak_rss():
+    """
+    The highest resident set size of this process so far in bytes, or None where it is not available.
+    """
+    if sys.platform == 'win32':
+        counters = _windows_memory_counters()
+        return counters.PeakWorkingSetSize if counters else None
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB on Linux and the BSDs
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def megabytes(size):
+    return None if size is None else round(size / 2 ** 20, 1)
+
+class RssSampler(threading.Thread):
+    """
+    Polls the RSS in the background while a stage runs; unlike tracemalloc it does not slow the stage.
+    peak stays None where current_rss() is not available.
+    """
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.start_rss = current_rss()
+        self.peak = self.start_rss
+        self._stop_event = threading.Event()
+
+    def _sample(self):
+        rss = current_rss()
+        if rss is not None:
+            self.peak = rss if self.peak is None else max(self.peak, rss)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self._sample()
+        return self.peak
+
+def enable(path=None):
+    """
+    Turns stage recording on for this process. path defaults to greenroof_profile.jsonl.
+    """
+    global _sink, _run_id
+    _sink = sys.stderr if path == '-' else (path if path not in (None, '1') else DEFAULT_PATH)
+    _run_id = uuid.uuid4().hex[:12]
+
+def disable():
+    global _sink
+    _sink = None
+
+def is_enabled():
+    return _sink is not None
+
+def _emit(record):
+    line = json.dumps(record) + '\n'
+    with _lock:
+        if _sink is sys.stderr:
+            sys.stderr.write(line)
+        else:
+            with open(_sink, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+class _NullStage:
+    """
+    What stage() returns while profiling is off: one shared object that does nothing.
+    """
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    def __init__(self, name, rows):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._sampler = RssSampler()
+        self._sampler.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        peak = self._sampler.stop()
+        _emit({'run_id': _run_id, 'pid': os.getpid(), 'time': time.time(), 'stage': self.name,
+               'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+               'peak_rss_mb': megabytes(peak), 'rows': self.rows,
+               'status': 'error' if exc_type else 'ok'})
+        return False
+
+def stage(name, rows=None):
+    """
+    Context manager around one pipeline stage, e.g.
+
+        with instrument.stage('merge') as s:
+            all_data = ...
+            s.rows = len(all_data)
+
+    Records wall time, CPU time, peak RSS and rows when profiling is on, and costs a
+    single check when it is off.
+    """
+    if _sink is None:
+        return _NULL_STAGE
+    return _Stage(name, rows)
+
+if os.environ.get(ENV_VAR):
+    enable(os.environ[ENV_VAR])
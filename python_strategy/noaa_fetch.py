@@ -0,0 +1,154 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Climate at a Glance county mapping CSVs:
+# {BASE_URL}/{parameter}/{yyyymm}/{months}/value.csv is the months-long period ending yyyymm
+BASE_URL = 'https://www.ncei.noaa.gov/access/monitoring/climate-at-a-glance/county/mapping/110'
+PARAMETERS = {
+    'tavg': "Average Temperature",
+    'tmax': "Maximum Temperature",
+    'tmin': "Minimum Temperature",
+    'pcp': "Precipitation",
+    'hdd': "Heating Degree Days",
+    'cdd': "Cooling Degree Days",
+    'pmdi': "Palmer Modified Drought Index",
+}
+# validators (ETag / Last-Modified) of every file in a store, keyed by its path in the store
+STATE_FILE = '.noaa_fetch.json'
+
+# path is relative to the store directory
+NoaaSeries = namedtuple('NoaaSeries', ['parameter', 'year', 'month', 'months', 'path'])
+# status is 'downloaded', 'unchanged' or 'failed'
+FetchResult = namedtuple('FetchResult', ['series', 'url', 'status', 'bytes', 'validators', 'error'])
+
+# the files in data/ that analysis.NOAA_FILES and the other scripts read
+DEFAULT_SERIES = [
+    NoaaSeries('hdd', 2025, 1, 12, 'hdd_with_meta.csv'),
+    NoaaSeries('cdd', 2025, 1, 12, 'cdd_with_meta.csv'),
+    NoaaSeries('pmdi', 2025, 8, 1, 'palmer_mod_drought_index_august.csv'),
+    NoaaSeries('tmax', 2025, 6, 1, 'max_temp_june.csv'),
+    NoaaSeries('tmax', 2025, 7, 1, 'max_temp_july.csv'),
+    NoaaSeries('tmax', 2025, 8, 1, 'max_temp_august.csv'),
+    NoaaSeries('tmin', 2025, 1, 1, 'min_temp_january.csv'),
+    NoaaSeries('tmin', 2025, 2, 1, 'min_temp_february.csv'),
+    NoaaSeries('tmin', 2025, 12, 1, 'min_temp_december.csv'),
+    NoaaSeries('tavg', 2025, 12, 12, 'avg_temp.csv'),
+    NoaaSeries('pcp', 2025, 12, 12, 'precipitation.csv'),
+]
+
+def series_matrix(parameters, years, months=range(1, 13), window=1):
+    """
+    Every parameter x year x month, each the window-months period ending that month,
+    stored as <parameter>/<yyyymm>-<window>.csv.
+    """
+    return [NoaaSeries(parameter, year, month, window, f"{parameter}/{year}{month:02d}-{window}.csv")
+            for parameter in parameters for year in years for month in months]
+
+def series_url(series, base_url=BASE_URL):
+    return f"{base_url.rstrip('/')}/{series.parameter}/{series.year}{series.month:02d}/{series.months}/value.csv"
+
+def make_session(pool_size=8, retries=4, backoff=0.5):
+    """
+    A requests Session keeping up to pool_size connections per host alive, retrying connection
+    errors, 429 and 5xx responses with exponential backoff (Retry-After is honoured).
+    """
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=['GET'], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def read_state(state_path):
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def write_state(state_path, state):
+    tmp_path = Path(str(state_path) + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, state_path)
+
+def fetch_one(session, series, url, path, validators=None, timeout=(10, 60)):
+    """
+    Downloads url to path unless the server says the copy from validators is current (304).
+    The body goes to a temporary file next to path and replaces it only once complete, so an
+    interrupted or failed download never leaves a partial file behind.
+    """
+    headers = {}
+    if validators and Path(path).exists():
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    tmp_path = Path(str(path) + '.part')
+    try:
+        with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+            if response.status_code == 304:
+                return FetchResult(series, url, 'unchanged', 0, validators, None)
+            response.raise_for_status()
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            size = 0
+            with open(tmp_path, 'wb') as f:
+                for block in response.iter_content(2 ** 16):
+                    if size == 0 and not block.lstrip().startswith((b'#', b'ID,')):
+                        raise ValueError("response is not a Climate at a Glance CSV")
+                    f.write(block)
+                    size += len(block)
+            if size == 0:
+                raise ValueError("empty response")
+            os.replace(tmp_path, path)
+            validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+            return FetchResult(series, url, 'downloaded', size, validators, None)
+    except (requests.RequestException, OSError, ValueError) as e:
+        tmp_path.unlink(missing_ok=True)
+        return FetchResult(series, url, 'failed', 0, validators, str(e))
+
+def fetch_all(series, store_dir, base_url=BASE_URL, max_workers=8, session=None, force=False, timeout=(10, 60)):
+    """
+    Fetches every NoaaSeries into store_dir over one pooled session, max_workers at a time.
+    Files already in the store are requested conditionally with the ETag / Last-Modified saved
+    from their last download (unless force), so unchanged files cost a 304 and no body.
+    Returns one FetchResult per series, in order.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    state_path = store_dir / STATE_FILE
+    state = read_state(state_path)
+    own_session = session is None
+    if own_session:
+        session = make_session(max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers) as pool:
+            futures = [pool.submit(fetch_one, session, item, series_url(item, base_url), store_dir / item.path,
+                                   None if force else state.get(item.path), timeout)
+                       for item in series]
+            results = [future.result() for future in futures]
+    finally:
+        if own_session:
+            session.close()
+    for result in results:
+        if result.status == 'downloaded':
+            state[result.series.path] = dict(result.validators, url=result.url)
+    write_state(state_path, state)
+    return results
+
+def parse_years(text):
+    """
+    '2020-2025' or '2019,2021' -> list of years.
+    """
+    years = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        years += list(range(int(first), int(last or first) + 1))
+    return years
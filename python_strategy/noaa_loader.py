@@ -0,0 +1,63 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import re
+import pandas as pd
+
+# Column names as written by Climate at a Glance, keyed by the short names callers use
+OPTIONAL_COLUMNS = {
+    'Anomaly': 'Anomaly (1901-2000 base period)',
+    '1901-2000 Mean': '1901-2000 Mean',
+}
+
+NoaaFile = namedtuple('NoaaFile', ['path', 'meta', 'data'])
+
+def read_noaa_header(path):
+    """
+    Reads the '#' metadata lines at the top of a NOAA county CSV.
+    Returns a dict with title, units, period, period_of_record and header_rows.
+    """
+    meta = {'title': None, 'units': None, 'period': None, 'period_of_record': None, 'header_rows': 0}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            meta['header_rows'] += 1
+            key, _, value = line[1:].strip().partition(':')
+            value = value.strip()
+            if key == 'Title':
+                meta['title'] = value
+                # e.g. 'August 2025 Contiguous U.S. County Maximum Temperature'
+                meta['period'] = value.split(' Contiguous U.S.')[0]
+            elif key == 'Units':
+                meta['units'] = value
+            elif key == 'Note':
+                match = re.search(r'Period of Record:\s*(\d+)', value)
+                if match:
+                    meta['period_of_record'] = int(match.group(1))
+    return meta
+
+def load_noaa_csv(path, extra=(), dtype=None):
+    """
+    Loads one NOAA county CSV, keeping only ID/Value plus any extra columns
+    ('Anomaly', '1901-2000 Mean'). Values keep the dtype pandas infers (int64 for
+    whole-number files like HDD, float64 otherwise), so the all_data.csv written from
+    them is unchanged; dtype (e.g. 'float32') narrows them for the array code.
+    """
+    meta = read_noaa_header(path)
+    columns = {'ID': str, 'Value': dtype}
+    for name in extra:
+        columns[OPTIONAL_COLUMNS[name]] = dtype
+    data = pd.read_csv(path, skiprows=meta['header_rows'], usecols=list(columns),
+                       dtype={name: kind for name, kind in columns.items() if kind is not None})
+    data = data.rename(columns={v: k for k, v in OPTIONAL_COLUMNS.items()})
+    return NoaaFile(path, meta, data)
+
+def load_noaa_files(paths, extra=(), max_workers=None, dtype=None):
+    """
+    Loads many NOAA county CSVs concurrently. Results come back in the order of paths.
+    """
+    paths = list(paths)
+    if len(paths) <= 1 or max_workers == 1:
+        return [load_noaa_csv(path, extra, dtype) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(paths), 8)) as pool:
+        return list(pool.map(lambda path: load_noaa_csv(path, extra, dtype), paths))
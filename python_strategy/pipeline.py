@@ -0,0 +1,226 @@
+from collections import namedtuple
+from functools import partial
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+from geometry_cache import hashed_source_key, load_continental
+from noaa_loader import load_noaa_csv
+from analysis import NOAA_FILES, reformat_geodata, analyze_data, join_variables
+from export import write_all_data, export_paths
+import instrument
+
+# bump when stage code changes in a way that should invalidate every cached output
+PIPELINE_VERSION = 1
+
+# func is called with the outputs of inputs, in order. params are the JSON-able settings func
+# is already bound to; they only feed the cache key. files are source files hashed by content,
+# outputs are files the stage writes (the stage is stale if one is missing).
+Stage = namedtuple('Stage', ['name', 'func', 'inputs', 'params', 'files', 'outputs'],
+                   defaults=((), None, (), ()))
+
+def _describe(obj):
+    """
+    Stable JSON form for the non-JSON things that show up in stage params.
+    """
+    if isinstance(obj, Path):
+        return str(obj)
+    # only render stages have these, and they come with matplotlib already loaded
+    import matplotlib.colors as colors
+    if isinstance(obj, colors.Normalize):
+        return {'norm': type(obj).__name__, 'vmin': obj.vmin, 'vmax': obj.vmax,
+                'vcenter': getattr(obj, 'vcenter', None)}
+    if isinstance(obj, colors.ListedColormap):
+        return {'cmap': [colors.to_hex(c) for c in obj.colors]}
+    if isinstance(obj, colors.Colormap):
+        return {'cmap': obj.name}
+    raise TypeError("Cannot describe " + repr(type(obj)))
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=_describe).encode())
+    return digest.hexdigest()
+
+class Pipeline:
+    """
+    Stage graph whose outputs are cached under a hash of the stage's source files, params
+    and the content hashes of its inputs. A stage whose upstream reran but produced the
+    same output stays fresh, so only what really changed is recomputed or re-rendered.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.stages = {}
+        self._file_hashes = None
+
+    def add(self, name, func, inputs=(), params=None, files=(), outputs=()):
+        for upstream in inputs:
+            if upstream not in self.stages:
+                raise KeyError(f"Stage {name!r} depends on unknown stage {upstream!r}")
+        self.stages[name] = Stage(name, func, tuple(inputs), params, tuple(files), tuple(outputs))
+        return self
+
+    def _stage_path(self, name, suffix):
+        return self.cache_dir / (re.sub(r'[^A-Za-z0-9_.-]+', '_', name) + suffix)
+
+    def _file_hash(self, path):
+        # content hashes are memoized by size and mtime so unchanged files are not re-read
+        if self._file_hashes is None:
+            index_path = self.cache_dir / 'file_hashes.json'
+            self._file_hashes = json.loads(index_path.read_text()) if index_path.exists() else {}
+        key = hashed_source_key(path, self._file_hashes.get(str(path)))
+        self._file_hashes[str(path)] = key
+        return key['sha256']
+
+    def _save_file_hashes(self):
+        if self._file_hashes is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / 'file_hashes.json').write_text(json.dumps(self._file_hashes))
+
+    def _read_meta(self, name):
+        meta_path = self._stage_path(name, '.json')
+        return json.loads(meta_path.read_text()) if meta_path.exists() else None
+
+    def _key(self, stage, input_hashes):
+        files = [self._file_hash(path) for path in stage.files]
+        return _digest(PIPELINE_VERSION, stage.name, stage.params, files, input_hashes,
+                       [str(path) for path in stage.outputs])
+
+    def _load(self, name):
+        if name not in self._outputs:
+            with open(self._stage_path(name, '.pkl'), 'rb') as f:
+                self._outputs[name] = pickle.load(f)
+        return self._outputs[name]
+
+    def _execute(self, stage, key):
+        with instrument.stage(stage.name) as record:
+            output = stage.func(*[self._load(upstream) for upstream in stage.inputs])
+            record.rows = len(output) if hasattr(output, '__len__') else None
+        payload = pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL)
+        output_hash = hashlib.sha256(payload).hexdigest()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._stage_path(stage.name, '.pkl.tmp')
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, self._stage_path(stage.name, '.pkl'))
+        self._stage_path(stage.name, '.json').write_text(json.dumps({'key': key, 'output_hash': output_hash}))
+        self._outputs[stage.name] = output
+        return output_hash
+
+    def _resolve(self, name, dry_run):
+        if name in self._hashes:
+            return self._hashes[name]
+        stage = self.stages[name]
+        input_hashes = [self._resolve(upstream, dry_run) for upstream in stage.inputs]
+        if None in input_hashes:
+            # dry run: an upstream stage would rerun, so this one cannot be judged yet
+            self._status[name] = 'stale (upstream)'
+            self._hashes[name] = None
+            return None
+
+        key = self._key(stage, input_hashes)
+        meta = self._read_meta(name)
+        fresh = (meta is not None and meta['key'] == key and self._stage_path(name, '.pkl').exists()
+                 and all(Path(path).exists() for path in stage.outputs))
+        if fresh:
+            self._status[name] = 'fresh'
+            self._hashes[name] = meta['output_hash']
+        elif dry_run:
+            self._status[name] = 'stale'
+            self._hashes[name] = None
+        else:
+            print("Running stage " + name)
+            self._status[name] = 'ran'
+            self._hashes[name] = self._execute(stage, key)
+        return self._hashes[name]
+
+    def run(self, targets=None, dry_run=False):
+        """
+        Brings targets (default: every stage) up to date. Returns stage name -> status,
+        one of 'fresh', 'ran', or with dry_run 'stale' / 'stale (upstream)'.
+        """
+        self._hashes, self._status, self._outputs = {}, {}, {}
+        for name in (targets or list(self.stages)):
+            self._resolve(name, dry_run)
+        if not dry_run:
+            self._save_file_hashes()
+        return dict(self._status)
+
+    def output(self, name):
+        """
+        The cached output of a stage that is up to date.
+        """
+        self.run([name])
+        return self._load(name)
+
+def _load_variable(path, name):
+    return reformat_geodata(load_noaa_csv(path).data, name)
+
+def _join(continental, *variables):
+    return join_variables(continental, list(variables))
+
+def _analyze(all_data, thresholds):
+    return analyze_data(all_data.copy(), thresholds)
+
+def _export(all_data, output_path, export_format):
+    return [str(path) for path in write_all_data(all_data, output_path, export_format)]
+
+def _select(all_data, column):
+    return all_data[['GEOID', column]].reset_index(drop=True)
+
+def _render(values, continental, spec):
+    from batch_render import render_map
+    return render_map(continental[['GEOID', 'geometry']].merge(values, on='GEOID'), spec)
+
+def build_pipeline(parent_path, thresholds=None, specs=None, cache_dir=None, export_format='parquet'):
+    """
+    The multi_plot flow as stages: load each NOAA file -> join -> analyze -> export and one
+    render per map. A render only depends on the one column it draws. matplotlib is only
+    imported for the default specs and when a render stage runs.
+    """
+    parent_path = Path(parent_path)
+    pipeline = Pipeline(cache_dir or parent_path / 'data/cache/pipeline')
+    continental_path = parent_path / 'data/continental.csv'
+    pipeline.add('continental', partial(load_continental, continental_path), files=[continental_path])
+
+    variables = []
+    for name, path in NOAA_FILES:
+        pipeline.add('load ' + name, partial(_load_variable, parent_path / path, name),
+                     params={'column': name}, files=[parent_path / path])
+        variables.append('load ' + name)
+    pipeline.add('join', _join, inputs=['continental'] + variables)
+    pipeline.add('analyze', partial(_analyze, thresholds=thresholds), inputs=['join'],
+                 params={'thresholds': thresholds})
+    export_path = parent_path / 'data/all_data'
+    outputs = [export_path.with_suffix('.csv')] if export_format == 'csv' else list(export_paths(export_path.with_suffix('.parquet')))
+    pipeline.add('export', partial(_export, output_path=export_path, export_format=export_format),
+                 inputs=['analyze'], params={'export_format': export_format}, outputs=outputs)
+
+    if specs is None:
+        from batch_render import geoplotting_specs
+        specs = geoplotting_specs(parent_path)
+    for spec in specs:
+        column_stage = 'column ' + spec.column
+        if column_stage not in pipeline.stages:
+            pipeline.add(column_stage, partial(_select, column=spec.column), inputs=['analyze'],
+                         params={'column': spec.column})
+        pipeline.add('render ' + Path(spec.output_path).name, partial(_render, spec=spec),
+                     inputs=[column_stage, 'continental'], params=spec._asdict(), outputs=[spec.output_path])
+    return pipeline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the all_data export and the maps.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/ and image/")
+    parser.add_argument('--dry-run', action='store_true', help="only list the stages that would rerun")
+    parser.add_argument('--csv', action='store_true', help="export all_data.csv instead of parquet")
+    parser.add_argument('--profile', nargs='?', const='1', help="write per-stage timings as JSON lines (default greenroof_profile.jsonl)")
+    args = parser.parse_args()
+    if args.profile:
+        instrument.enable(args.profile)
+
+    status = build_pipeline(args.parent, export_format='csv' if args.csv else 'parquet').run(dry_run=args.dry_run)
+    for name, state in status.items():
+        print(f"{state:>17}  {name}")
@@ -0,0 +1,140 @@
+from collections import namedtuple
+from pathlib import Path
+import os
+import numpy as np
+import matplotlib
+import matplotlib.colors as colors
+import matplotlib.image as mpimg
+import shapely
+from geometry_cache import file_sha256, load_continental, source_key, source_unchanged
+
+# grid holds the row position of the county in geoids for every pixel, -1 outside all counties.
+# bounds is (minx, miny, maxx, maxy) in EPSG:5070 metres, row 0 is the northern edge.
+LabelGrid = namedtuple('LabelGrid', ['grid', 'geoids', 'bounds', 'resolution'])
+
+def build_label_grid(continental, resolution=2000., chunk_rows=256):
+    """
+    Rasterizes the county polygons into an int32 county-index grid, sampling each pixel center.
+    """
+    minx, miny, maxx, maxy = continental.total_bounds
+    width = int(np.ceil((maxx - minx) / resolution))
+    height = int(np.ceil((maxy - miny) / resolution))
+    grid = np.full((height, width), -1, dtype=np.int32)
+    tree = shapely.STRtree(np.asarray(continental.geometry))
+    xs = minx + (np.arange(width) + 0.5) * resolution
+
+    # a band of rows at a time keeps the point arrays small
+    for top in range(0, height, chunk_rows):
+        rows = np.arange(top, min(top + chunk_rows, height))
+        ys = maxy - (rows + 0.5) * resolution
+        px, py = np.meshgrid(xs, ys)
+        points = shapely.points(px.ravel(), py.ravel())
+        point_idx, county_idx = tree.query(points, predicate='within')
+        band = grid[rows[0]:rows[-1] + 1].reshape(-1)
+        band[point_idx] = county_idx
+    geoids = np.asarray(continental['GEOID'], dtype=np.int32)
+    return LabelGrid(grid, geoids, (minx, miny, maxx, maxy), float(resolution))
+
+def default_grid_path(continental_path, resolution):
+    continental_path = Path(continental_path)
+    return continental_path.parent / 'cache' / f"{continental_path.stem}_labels_{float(resolution):g}m.npz"
+
+def load_label_grid(continental_path, resolution=2000., cache_path=None):
+    """
+    Returns the label grid for continental.csv, rasterizing only when the cached grid
+    was built from a different source file or resolution. The source is only hashed
+    when its size/mtime changed (geometry_cache.source_unchanged).
+    """
+    cache_path = Path(cache_path) if cache_path else default_grid_path(continental_path, resolution)
+    if cache_path.exists():
+        cached = np.load(cache_path)
+        if {'size', 'mtime_ns', 'sha256'} <= set(cached.files) and float(cached['resolution']) == float(resolution):
+            key = {name: cached[name].item() for name in ('size', 'mtime_ns', 'sha256')}
+            if source_unchanged(continental_path, key, cache_path):
+                return LabelGrid(cached['grid'], cached['geoids'], tuple(cached['bounds']), float(cached['resolution']))
+
+    print("Building label grid " + str(cache_path))
+    key = source_key(continental_path, file_sha256(continental_path))
+    label_grid = build_label_grid(load_continental(continental_path), resolution)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.stem + '.tmp.npz')
+    np.savez_compressed(tmp_path, grid=label_grid.grid, geoids=label_grid.geoids,
+                        bounds=np.asarray(label_grid.bounds), resolution=label_grid.resolution,
+                        size=key['size'], mtime_ns=key['mtime_ns'], sha256=key['sha256'])
+    os.replace(tmp_path, cache_path)
+    return label_grid
+
+def county_values(label_grid, all_data, column):
+    """
+    Reorders all_data[column] into the grid's county order, NaN where a county has no value.
+    """
+    values = np.full(len(label_grid.geoids), np.nan)
+    order = np.argsort(label_grid.geoids)
+    pos = np.searchsorted(label_grid.geoids, np.asarray(all_data['GEOID']), sorter=order)
+    pos = np.clip(pos, 0, len(order) - 1)
+    found = label_grid.geoids[order[pos]] == np.asarray(all_data['GEOID'])
+    values[order[pos[found]]] = np.asarray(all_data[column], dtype=float)[found]
+    return values
+
+def _color_lut(values, cmap, norm):
+    """
+    One RGBA row per county plus a last, fully transparent row that -1 (no county) indexes.
+    Returns (lut, norm actually used).
+    """
+    cmap = matplotlib.colormaps[cmap] if isinstance(cmap, str) else cmap
+    values = np.ma.masked_invalid(np.asarray(values, dtype=float))
+    if norm is None:
+        norm = colors.Normalize(values.min(), values.max())
+    lut = np.zeros((len(values) + 1, 4), dtype=np.uint8)
+    lut[:-1] = cmap(norm(values), bytes=True)
+    lut[:-1][np.ma.getmaskarray(values)] = 0
+    return lut, norm
+
+def render_raster(label_grid, values, output_path, cmap='RdYlBu_r', norm=None):
+    """
+    Colors one value per county through cmap/norm (e.g. the TwoSlopeNorms in geoplotting)
+    and writes the indexed grid straight to a PNG. Pixels outside counties are transparent.
+    """
+    lut, _ = _color_lut(values, cmap, norm)
+    mpimg.imsave(output_path, lut[label_grid.grid])
+    return output_path
+
+def render_raster_map(label_grid, all_data, spec, dpi=300):
+    """
+    Draws a batch_render.MapSpec from the label grid: the same figure size, title, colorbar or
+    category legend as batch_render.render_map, but the counties are one indexed image instead
+    of thousands of polygons. County borders are not drawn.
+    """
+    import matplotlib.pyplot as plt
+    from geoplotting import category_colors, category_legend
+    values = county_values(label_grid, all_data, spec.column)
+    fig, ax = plt.subplots(figsize=spec.figsize)
+    if spec.labels is not None:
+        known = np.isfinite(values)
+        names = np.full(len(values), None, dtype=object)
+        names[known] = [spec.labels.get(int(code)) for code in values[known]]
+        rgba = category_colors(names, list(spec.cmap.colors))
+        lut = np.zeros((len(values) + 1, 4), dtype=np.uint8)
+        for i, name in enumerate(names):
+            if name is not None:
+                lut[i] = np.round(np.asarray(rgba[name]) * 255)
+        category_legend(ax, rgba, (spec.legend_kwds or {}).get('title', "Advisability"))
+    else:
+        lut, norm = _color_lut(values, spec.cmap, spec.norm)
+        mappable = plt.cm.ScalarMappable(norm=norm, cmap=spec.cmap)
+        legend_kwds = spec.legend_kwds or {'label': spec.label or spec.title, 'orientation': "horizontal"}
+        fig.colorbar(mappable, ax=ax, **legend_kwds)
+    minx, miny, maxx, maxy = label_grid.bounds
+    # the grid covers whole pixels from the north-west corner, so it can reach past maxx/miny
+    height, width = label_grid.grid.shape
+    extent = (minx, minx + width * label_grid.resolution, maxy - height * label_grid.resolution, maxy)
+    ax.imshow(lut[label_grid.grid], extent=extent, interpolation='nearest')
+    ax.set_xlim(minx, maxx)
+    ax.set_ylim(miny, maxy)
+    ax.set_axis_off()
+    ax.set_title(spec.title, fontsize=20)
+    if isinstance(spec.output_path, (str, Path)):
+        Path(spec.output_path).parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(spec.output_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return str(spec.output_path)
@@ -0,0 +1,120 @@
+from collections import namedtuple
+import operator
+import numpy as np
+import pandas as pd
+
+# column op threshold, where threshold names a scenario parameter
+Rule = namedtuple('Rule', ['column', 'op', 'threshold'])
+# levels[i] is a list of rules that must all hold for code i + 1; the highest level that holds wins
+Regime = namedtuple('Regime', ['name', 'levels'])
+
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+REGIMES = [
+    Regime('GREEN ROOF', [
+        [Rule('MIN TEMP', '>', 'green_min_temp')],
+        [Rule('MIN TEMP', '>', 'green_min_temp_high')],
+    ]),
+    # based on >4 data
+    Regime('COOL ROOF', [
+        [Rule('CDD', '>', 'cool_cdd'), Rule('HDD', '<', 'cool_hdd')],
+    ]),
+    Regime('roof_regime', [
+        [Rule('HDD_per_CDD', '>', 'hdd_per_cdd')],
+    ]),
+]
+
+DEFAULT_THRESHOLDS = {
+    'green_min_temp': 20.,
+    'green_min_temp_high': 31.3,
+    'cool_cdd': 2700.,
+    'cool_hdd': 3600.,
+    'hdd_per_cdd': 7.,
+}
+
+SweepResult = namedtuple('SweepResult', ['scenarios', 'codes', 'counts', 'sensitivity'])
+
+def _regime(name):
+    for regime in REGIMES:
+        if regime.name == name:
+            return regime
+    raise KeyError("Unknown regime " + repr(name))
+
+def evaluate(regime, data, scenarios):
+    """
+    Evaluates one regime for every scenario at once.
+    data maps column -> (counties,) values, scenarios maps parameter -> (scenarios,) thresholds.
+    Returns an int8 (scenarios, counties) matrix of regime codes; NaN values never satisfy a rule.
+    """
+    regime = _regime(regime) if isinstance(regime, str) else regime
+    n_scenarios = len(next(iter(scenarios.values())))
+    n_counties = len(next(iter(data.values())) if isinstance(data, dict) else data)
+    codes = np.zeros((n_scenarios, n_counties), dtype=np.int8)
+    for level, rules in enumerate(regime.levels, start=1):
+        holds = np.ones((n_scenarios, n_counties), dtype=bool)
+        for rule in rules:
+            values = np.asarray(data[rule.column], dtype=np.float64)[None, :]
+            thresholds = np.asarray(scenarios[rule.threshold], dtype=np.float64)[:, None]
+            holds &= OPERATORS[rule.op](values, thresholds)
+        codes[holds] = level
+    return codes
+
+def classify(data, thresholds=None, regimes=None):
+    """
+    Single-scenario classification: returns regime name -> (counties,) int8 codes.
+    """
+    params = dict(DEFAULT_THRESHOLDS)
+    params.update(thresholds or {})
+    scenario = {name: np.array([value]) for name, value in params.items()}
+    names = regimes or [regime.name for regime in REGIMES]
+    return {name: evaluate(name, data, scenario)[0] for name in names}
+
+def threshold_grid(**ranges):
+    """
+    Cartesian product of threshold ranges, e.g. threshold_grid(cool_cdd=np.arange(2000, 3500, 50)).
+    Parameters not given stay at their default. Returns parameter -> (scenarios,) arrays.
+    """
+    names = list(ranges)
+    values = [np.atleast_1d(np.asarray(ranges[name], dtype=np.float64)) for name in names]
+    mesh = np.meshgrid(*values, indexing='ij') if values else []
+    n_scenarios = int(np.prod([len(v) for v in values])) if values else 1
+    scenarios = {name: np.full(n_scenarios, value) for name, value in DEFAULT_THRESHOLDS.items()}
+    for name, grid in zip(names, mesh):
+        scenarios[name] = grid.ravel()
+    return scenarios
+
+def sweep(data, scenarios, regime='GREEN ROOF', baseline=None, chunk_size=4096, keep_codes=True):
+    """
+    Runs a batch of threshold scenarios for one regime, chunked over scenarios to bound memory.
+    counts is (scenarios, levels + 1): how many counties get each code per scenario.
+    sensitivity is (counties,): the share of scenarios in which a county's code differs
+    from its code under the baseline (default) thresholds.
+    With keep_codes=False the full (scenarios, counties) code matrix is not kept.
+    """
+    regime = _regime(regime) if isinstance(regime, str) else regime
+    n_scenarios = len(next(iter(scenarios.values())))
+    base = classify(data, baseline, [regime.name])[regime.name]
+    n_levels = len(regime.levels) + 1
+
+    codes = np.empty((n_scenarios, len(base)), dtype=np.int8) if keep_codes else None
+    counts = np.zeros((n_scenarios, n_levels), dtype=np.int64)
+    changed = np.zeros(len(base), dtype=np.int64)
+    for start in range(0, n_scenarios, chunk_size):
+        stop = min(start + chunk_size, n_scenarios)
+        chunk = {name: np.asarray(values)[start:stop] for name, values in scenarios.items()}
+        chunk_codes = evaluate(regime, data, chunk)
+        if keep_codes:
+            codes[start:stop] = chunk_codes
+        for code in range(n_levels):
+            counts[start:stop, code] = (chunk_codes == code).sum(axis=1)
+        changed += (chunk_codes != base[None, :]).sum(axis=0)
+    return SweepResult(scenarios, codes, counts, changed / max(n_scenarios, 1))
+
+def scenario_table(result):
+    """
+    One row per scenario: its thresholds and the county count for each code.
+    """
+    table = pd.DataFrame({name: np.asarray(values) for name, values in result.scenarios.items()})
+    for code in range(result.counts.shape[1]):
+        table[f"count_{code}"] = result.counts[:, code]
+    return table
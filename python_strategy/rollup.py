@@ -0,0 +1,162 @@
+from pathlib import Path
+import argparse
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from geoid import STATE_TO_FIPS
+from geometry_cache import (CONTINENTAL_CRS, default_cache_path, is_cache_valid, load_continental,
+                            read_geometry_cache, write_geometry_cache)
+from export import REGIME_COLUMNS, read_all_data
+
+# NOAA's nine U.S. climate regions (Karl and Koss, 1984), DC counted with the Northeast
+CLIMATE_REGIONS = {
+    'Northeast': ['CT', 'DC', 'DE', 'MA', 'MD', 'ME', 'NH', 'NJ', 'NY', 'PA', 'RI', 'VT'],
+    'Upper Midwest': ['IA', 'MI', 'MN', 'WI'],
+    'Ohio Valley': ['IL', 'IN', 'KY', 'MO', 'OH', 'TN', 'WV'],
+    'Southeast': ['AL', 'FL', 'GA', 'NC', 'SC', 'VA'],
+    'Northern Rockies and Plains': ['MT', 'ND', 'NE', 'SD', 'WY'],
+    'South': ['AR', 'KS', 'LA', 'MS', 'OK', 'TX'],
+    'Southwest': ['AZ', 'CO', 'NM', 'UT'],
+    'Northwest': ['ID', 'OR', 'WA'],
+    'West': ['CA', 'NV'],
+}
+_FIPS_TO_STATE = {fips: abbr for abbr, fips in STATE_TO_FIPS.items()}
+_STATE_TO_REGION = {abbr: region for region, states in CLIMATE_REGIONS.items() for abbr in states}
+
+def group_labels(geoids, grouping):
+    """
+    County GEOIDs -> state abbreviation ('state') or climate region name ('region'), None if unknown.
+    """
+    states = [_FIPS_TO_STATE.get(fips) for fips in np.asarray(geoids) // 1000]
+    if grouping == 'state':
+        return np.array(states, dtype=object)
+    if grouping == 'region':
+        return np.array([_STATE_TO_REGION.get(state) for state in states], dtype=object)
+    raise ValueError("grouping must be 'state' or 'region', got " + repr(grouping))
+
+def dissolve_counties(continental, grouping):
+    """
+    One outline per group: group, counties, area (m2), member_geoids, member_areas, geometry.
+    member_geoids/member_areas list each group's counties, so the county -> group index and the
+    area weights are stored with the outlines they belong to.
+    """
+    labels = group_labels(continental['GEOID'], grouping)
+    known = pd.notna(labels)
+    geometry = np.asarray(continental.geometry)[known]
+    geoids = continental['GEOID'].to_numpy()[known]
+    areas = shapely.area(geometry)
+    order = np.argsort(labels[known].astype(str), kind='stable')
+    groups, starts = np.unique(labels[known][order].astype(str), return_index=True)
+    ends = np.append(starts[1:], len(order))
+
+    rows = []
+    for group, start, end in zip(groups, starts, ends):
+        members = order[start:end]
+        rows.append({'group': group, 'counties': len(members), 'area': areas[members].sum(),
+                     'member_geoids': geoids[members], 'member_areas': areas[members],
+                     'geometry': shapely.union_all(geometry[members])})
+    return gpd.GeoDataFrame(rows, geometry='geometry', crs=CONTINENTAL_CRS)
+
+def rollup_cache_path(continental_path, grouping):
+    cache_path = default_cache_path(continental_path)
+    return cache_path.with_name(f"{cache_path.stem}_{grouping}.parquet")
+
+class Rollup:
+    """
+    Cached group outlines plus the county -> group index. Dissolving the county polygons is
+    the expensive part and runs once per continental.csv; every reduce() afterwards is a few
+    bincounts over the county rows.
+    """
+    def __init__(self, outlines):
+        self.outlines = outlines.drop(columns=['member_geoids', 'member_areas'])
+        self.geoids = pd.Index(np.concatenate(list(outlines['member_geoids'])))
+        self.codes = np.repeat(np.arange(len(outlines)), outlines['counties'].to_numpy())
+        self.areas = np.concatenate(list(outlines['member_areas']))
+
+    def group_of(self, geoids):
+        """
+        Position in self.outlines of each GEOID's group, -1 for counties outside every group.
+        """
+        positions = self.geoids.get_indexer(np.asarray(geoids))
+        return np.where(positions >= 0, self.codes[positions], -1)
+
+    def reduce(self, all_data, columns, weights='area'):
+        """
+        Weighted mean of each column per group, as a GeoDataFrame of the outlines.
+        Regime columns become the weighted share of counties where the roof is advisable (code > 0).
+        weights is 'area', 'count', a column of all_data (e.g. population) or an array per row.
+        NaN and infinite values (HDD_per_CDD where CDD is 0) are left out of their column.
+        """
+        positions = self.geoids.get_indexer(all_data['GEOID'].to_numpy())
+        codes = np.where(positions >= 0, self.codes[positions], -1)
+        if isinstance(weights, str) and weights == 'area':
+            w = np.where(positions >= 0, self.areas[positions], 0.)
+        elif isinstance(weights, str) and weights == 'count':
+            w = np.ones(len(all_data))
+        elif isinstance(weights, str):
+            w = all_data[weights].to_numpy(dtype=np.float64)
+        else:
+            w = np.asarray(weights, dtype=np.float64)
+        keep = codes >= 0
+        codes, w = codes[keep], np.nan_to_num(w[keep])
+
+        result = self.outlines.copy()
+        n = len(result)
+        for column in columns:
+            values = all_data[column].to_numpy(dtype=np.float64)[keep]
+            if column in REGIME_COLUMNS:
+                values = (values > 0).astype(np.float64)
+            valid = np.isfinite(values)
+            total = np.bincount(codes[valid], weights=w[valid] * values[valid], minlength=n)
+            weight = np.bincount(codes[valid], weights=w[valid], minlength=n)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[column] = np.where(weight > 0, total / weight, np.nan)
+        return result
+
+def load_rollup(continental_path, grouping, refresh=False):
+    """
+    The Rollup of continental_path by 'state' or 'region', dissolving only when the cached
+    outlines are missing or continental.csv changed.
+    """
+    cache_path = rollup_cache_path(continental_path, grouping)
+    if not refresh and cache_path.exists() and is_cache_valid(continental_path, cache_path):
+        return Rollup(read_geometry_cache(cache_path))
+    print(f"Dissolving counties by {grouping} into {cache_path}")
+    outlines = dissolve_counties(load_continental(continental_path), grouping)
+    write_geometry_cache(outlines, continental_path, cache_path)
+    return Rollup(read_geometry_cache(cache_path))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll the county analysis up to states or NOAA climate regions.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--grouping', choices=['state', 'region'], default='region')
+    parser.add_argument('--weights', default='area', help="area, count or a column of all_data (e.g. population)")
+    parser.add_argument('--columns', nargs='+', default=['HDD', 'CDD', 'GREEN ROOF', 'COOL ROOF'])
+    parser.add_argument('--input', help="all_data.parquet (default data/all_data.parquet)")
+    parser.add_argument('--output', help="write the rollup table to this csv")
+    parser.add_argument('--map', metavar='COLUMN', help="also draw COLUMN by group to image/<grouping>_<column>.png")
+    parser.add_argument('--refresh', action='store_true', help="dissolve again even if the cache is valid")
+    args = parser.parse_args()
+
+    parent_path = Path(args.parent)
+    rollup = load_rollup(parent_path / 'data/continental.csv', args.grouping, args.refresh)
+    columns = list(args.columns) + ([args.weights] if args.weights not in ('area', 'count') else [])
+    all_data = read_all_data(args.input or parent_path / 'data/all_data.parquet', columns)
+    result = rollup.reduce(all_data, args.columns, args.weights)
+
+    table = pd.DataFrame(result.drop(columns='geometry'))
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.to_string(index=False))
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print("Data saved " + args.output)
+    if args.map:
+        import matplotlib
+        matplotlib.use('Agg')
+        from batch_render import MapSpec, render_map
+        share = f" (advisable share, {args.weights}-weighted)" if args.map in REGIME_COLUMNS else ""
+        spec = MapSpec(args.map, None, 'RdYlBu_r', f"{args.map}{share} by {args.grouping.title()}",
+                       parent_path / 'image' / f"{args.grouping}_{args.map.lower().replace(' ', '_')}.png")
+        print("Map saved " + render_map(result, spec))
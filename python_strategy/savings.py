@@ -0,0 +1,231 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from noaa_loader import load_noaa_csv
+from geoid import convert_geoid_data_to_number
+from export import read_all_data
+
+# Screening-level roof heat balance per m2 of roof, driven by the county climate columns.
+# Conduction through the roof follows the degree days; solar gain on the roof surface adds a
+# sol-air temperature rise of absorptance * irradiance / film coefficient over the cooling days
+# and offsets heating over the rest of the year. A green roof adds substrate insulation (less
+# when wet or frozen) and removes part of the summer solar load by evapotranspiration, limited
+# by the water available (precipitation, Palmer index) and driven by summer heat (MAX TEMP).
+MODEL_PARAMETERS = {
+    'baseline_albedo': 0.15,        # dark membrane the configurations are compared against
+    'green_albedo': 0.20,
+    'irradiance': 200.,             # W/m2, annual mean on a horizontal roof
+    'winter_solar_factor': 0.5,     # heating season irradiance relative to the annual mean
+    'film_coefficient': 17.,        # W/m2K outside surface
+    'substrate_r_per_inch': 0.6,    # h ft2 F/Btu, dry growing medium
+    'wet_substrate_loss': 0.25,     # share of substrate R lost when fully wet
+    'frozen_substrate_loss': 0.2,   # share of substrate R lost in the heating season where MIN TEMP < 32F
+    'max_evapotranspiration': 0.5,  # share of absorbed summer solar removed at full water and heat
+    'full_precipitation': 40.,      # inches/year at which water no longer limits evapotranspiration
+}
+
+# heating efficiency (delivered / fuel) and cooling COP of the HVAC serving the top floor
+BuildingType = namedtuple('BuildingType', ['heating_efficiency', 'cooling_cop'])
+BUILDING_TYPES = {
+    'residential': BuildingType(0.85, 3.0),
+    'office': BuildingType(0.80, 3.5),
+    'retail': BuildingType(0.80, 3.2),
+    'warehouse': BuildingType(0.78, 2.8),
+}
+ROOF_TYPES = ['cool', 'green']
+
+# the county inputs the model reads, all_data column -> model name
+INPUT_COLUMNS = {'HDD': 'hdd', 'CDD': 'cdd', 'MIN TEMP': 'min_temp', 'MAX TEMP': 'max_temp',
+                 'PALMER MOD INDEX': 'palmer', 'PRECIPITATION': 'precipitation'}
+
+R_SI_PER_R_IP = 0.1761          # m2K/W per h ft2 F/Btu
+KELVIN_HOURS_PER_F_DAY = 24 * 5 / 9
+
+SavingsResult = namedtuple('SavingsResult', ['configurations', 'heating', 'cooling', 'total',
+                                             'best', 'best_total', 'mean_total'])
+
+def configuration_grid(albedo=(0.65,), r_value=(13.,), depth=(4.,), building=('residential',), roof=ROOF_TYPES):
+    """
+    Every roof configuration to evaluate, as name -> (configurations,) arrays like
+    regimes.threshold_grid: cool roofs over albedo x r_value x building, green roofs over
+    depth (inches of substrate) x r_value x building. r_value is the existing roof insulation
+    (h ft2 F/Btu); roof and building are indexes into ROOF_TYPES and BUILDING_TYPES.
+    """
+    rows = []
+    if 'cool' in roof:
+        rows += [(0, a, r, 0., b) for a, r, b in itertools.product(albedo, r_value, building)]
+    if 'green' in roof:
+        rows += [(1, MODEL_PARAMETERS['green_albedo'], r, d, b) for d, r, b in itertools.product(depth, r_value, building)]
+    names = list(BUILDING_TYPES)
+    return {
+        'roof': np.array([row[0] for row in rows], dtype=np.int8),
+        'albedo': np.array([row[1] for row in rows], dtype=np.float64),
+        'r_value': np.array([row[2] for row in rows], dtype=np.float64),
+        'depth': np.array([row[3] for row in rows], dtype=np.float64),
+        'building': np.array([names.index(row[4]) for row in rows], dtype=np.int8),
+    }
+
+def configuration_table(configurations):
+    table = pd.DataFrame(configurations)
+    table['roof'] = np.array(ROOF_TYPES)[table['roof']]
+    table['building'] = np.array(list(BUILDING_TYPES))[table['building']]
+    return table
+
+def model_inputs(all_data, precipitation=None):
+    """
+    all_data -> model name -> (counties,) float64 arrays. PRECIPITATION comes from all_data if it
+    has the column, else from a precipitation frame (GEOID, PRECIPITATION); counties without it
+    (NaN) are modelled at full_precipitation by roof_savings, so water never limits them.
+    """
+    if 'PRECIPITATION' not in all_data and precipitation is not None:
+        all_data = all_data.merge(precipitation, on='GEOID', how='left')
+    inputs = {}
+    for column, name in INPUT_COLUMNS.items():
+        if column in all_data:
+            inputs[name] = all_data[column].to_numpy(dtype=np.float64)
+    inputs.setdefault('precipitation', np.full(len(all_data), MODEL_PARAMETERS['full_precipitation']))
+    inputs.setdefault('palmer', np.zeros(len(all_data)))
+    return inputs
+
+def roof_savings(inputs, configurations, parameters=None):
+    """
+    Annual savings per m2 of roof against the dark baseline roof with the same insulation,
+    as (heating, cooling) kWh of purchased energy, each (configurations, counties) float32.
+    Every term broadcasts configurations down the first axis and counties along the second.
+    """
+    p = dict(MODEL_PARAMETERS)
+    p.update(parameters or {})
+    county = {name: np.asarray(values, dtype=np.float64)[None, :] for name, values in inputs.items()}
+    config = {name: np.asarray(values)[:, None] for name, values in configurations.items()}
+    buildings = list(BUILDING_TYPES.values())
+    heating_efficiency = np.array([b.heating_efficiency for b in buildings])[config['building']]
+    cooling_cop = np.array([b.cooling_cop for b in buildings])[config['building']]
+
+    hdd_kh = np.nan_to_num(county['hdd']) * KELVIN_HOURS_PER_F_DAY
+    cdd_kh = np.nan_to_num(county['cdd']) * KELVIN_HOURS_PER_F_DAY
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cooling_days = np.nan_to_num(365. * cdd_kh / (hdd_kh + cdd_kh))
+    # sol-air temperature rise per unit absorptance, in kelvin hours over each season
+    solar_kh = p['irradiance'] / p['film_coefficient'] * 24.
+    solar_cooling_kh = solar_kh * cooling_days
+    solar_heating_kh = solar_kh * p['winter_solar_factor'] * (365. - cooling_days)
+
+    precipitation = np.nan_to_num(county['precipitation'], nan=p['full_precipitation'])
+    water = (np.clip(precipitation / p['full_precipitation'], 0., 1.)
+             * np.clip(1. + np.nan_to_num(county['palmer']) / 10., 0.6, 1.4) / 1.4)
+    heat = np.clip((np.nan_to_num(county['max_temp'], nan=70.) - 50.) / 40., 0., 1.)
+    green = config['roof'] == 1
+    substrate_r = config['depth'] * p['substrate_r_per_inch'] * (1. - p['wet_substrate_loss'] * water)
+    frozen = np.nan_to_num(county['min_temp'], nan=40.) < 32.
+    substrate_r_heating = substrate_r * np.where(frozen, 1. - p['frozen_substrate_loss'], 1.)
+    evapotranspiration = np.where(green, p['max_evapotranspiration'] * water * heat, 0.)
+
+    base_u = 1. / (np.maximum(config['r_value'], 1.) * R_SI_PER_R_IP)
+    cooling_u = 1. / ((np.maximum(config['r_value'], 1.) + np.where(green, substrate_r, 0.)) * R_SI_PER_R_IP)
+    heating_u = 1. / ((np.maximum(config['r_value'], 1.) + np.where(green, substrate_r_heating, 0.)) * R_SI_PER_R_IP)
+    base_absorptance = 1. - p['baseline_albedo']
+    absorptance = 1. - config['albedo']
+
+    # kWh/m2 of heat through the roof; the sun lowers the heating load but never below zero
+    base_heating = base_u * np.maximum(hdd_kh - base_absorptance * solar_heating_kh, 0.) / 1000.
+    base_cooling = base_u * (cdd_kh + base_absorptance * solar_cooling_kh) / 1000.
+    heating = heating_u * np.maximum(hdd_kh - absorptance * solar_heating_kh, 0.) / 1000.
+    cooling = cooling_u * (cdd_kh + absorptance * (1. - evapotranspiration) * solar_cooling_kh) / 1000.
+
+    heating_savings = (base_heating - heating) / heating_efficiency
+    cooling_savings = (base_cooling - cooling) / cooling_cop
+    return heating_savings.astype(np.float32), cooling_savings.astype(np.float32)
+
+def _savings_chunk(inputs, configurations, parameters, keep_savings):
+    """
+    roof_savings of one chunk reduced to what evaluate_grid keeps, so worker processes send back
+    (configurations,) and (counties,) summaries instead of the matrices when keep_savings is off.
+    """
+    heating, cooling = roof_savings(inputs, configurations, parameters)
+    total = heating + cooling
+    best = total.argmax(axis=0)
+    best_total = total[best, np.arange(total.shape[1])]
+    if not keep_savings:
+        heating = cooling = None
+    return heating, cooling, best, best_total, total.mean(axis=1)
+
+def evaluate_grid(inputs, configurations, parameters=None, chunk_size=1024, max_workers=1, keep_savings=True):
+    """
+    Runs roof_savings over every configuration, chunk_size configurations at a time so the
+    intermediates stay (chunk_size, counties). With max_workers > 1 (None: one per CPU) the
+    chunks run in worker processes. With keep_savings=False only the per-county best
+    configuration and the per-configuration mean are kept, not the full matrices.
+    """
+    n_configs = len(next(iter(configurations.values())))
+    n_counties = len(next(iter(inputs.values())))
+    chunks = [{name: np.asarray(values)[start:start + chunk_size] for name, values in configurations.items()}
+              for start in range(0, n_configs, chunk_size)]
+    shape = (n_configs, n_counties) if keep_savings else (0, n_counties)
+    heating, cooling = np.empty(shape, dtype=np.float32), np.empty(shape, dtype=np.float32)
+    best = np.zeros(n_counties, dtype=np.int64)
+    best_total = np.full(n_counties, -np.inf, dtype=np.float32)
+    mean_total = np.empty(n_configs, dtype=np.float32)
+
+    executor = ProcessPoolExecutor(max_workers) if max_workers != 1 else None
+    args = (itertools.repeat(inputs), chunks, itertools.repeat(parameters), itertools.repeat(keep_savings))
+    try:
+        results = map(_savings_chunk, *args) if executor is None else executor.map(_savings_chunk, *args)
+        start = 0
+        for chunk_heating, chunk_cooling, chunk_best, chunk_best_total, chunk_mean in results:
+            stop = start + len(chunk_mean)
+            if keep_savings:
+                heating[start:stop], cooling[start:stop] = chunk_heating, chunk_cooling
+            better = chunk_best_total > best_total
+            best[better] = start + chunk_best[better]
+            best_total[better] = chunk_best_total[better]
+            mean_total[start:stop] = chunk_mean
+            start = stop
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return SavingsResult(configurations, heating if keep_savings else None, cooling if keep_savings else None,
+                         heating + cooling if keep_savings else None, best, best_total, mean_total)
+
+def load_precipitation(path):
+    """
+    The annual precipitation NOAA file as GEOID, PRECIPITATION.
+    """
+    data = convert_geoid_data_to_number(load_noaa_csv(path).data, 'ID')
+    return data.rename(columns={'ID': 'GEOID', 'Value': 'PRECIPITATION'})[['GEOID', 'PRECIPITATION']]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate green and cool roof energy savings per county and roof configuration.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--albedo', nargs='+', type=float, default=[0.55, 0.65, 0.75, 0.85])
+    parser.add_argument('--r-value', nargs='+', type=float, default=[5., 13., 20., 30.])
+    parser.add_argument('--depth', nargs='+', type=float, default=[3., 4., 6., 8.], help="green roof substrate, inches")
+    parser.add_argument('--building', nargs='+', choices=list(BUILDING_TYPES), default=list(BUILDING_TYPES))
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=1, help="processes, 0 for one per CPU")
+    parser.add_argument('--output', help="write each county's best configuration to this csv")
+    args = parser.parse_args()
+
+    parent_path = Path(args.parent)
+    all_data = read_all_data(parent_path / 'data/all_data.parquet', [c for c in INPUT_COLUMNS if c != 'PRECIPITATION'])
+    precipitation_path = parent_path / 'data/precipitation.csv'
+    precipitation = load_precipitation(precipitation_path) if precipitation_path.exists() else None
+    inputs = model_inputs(all_data, precipitation)
+    configurations = configuration_grid(args.albedo, args.r_value, args.depth, args.building)
+    result = evaluate_grid(inputs, configurations, chunk_size=args.chunk_size,
+                           max_workers=args.workers or None, keep_savings=False)
+
+    table = configuration_table(configurations)
+    table['mean_savings_kwh_m2'] = result.mean_total
+    print(table.sort_values('mean_savings_kwh_m2', ascending=False).head(10).to_string(index=False))
+    best = configuration_table({name: values[result.best] for name, values in configurations.items()})
+    best.insert(0, 'GEOID', all_data['GEOID'].to_numpy())
+    best['savings_kwh_m2'] = result.best_total
+    print(best['roof'].value_counts().to_string())
+    if args.output:
+        best.to_csv(args.output, index=False)
+        print("Data saved " + args.output)
@@ -0,0 +1,260 @@
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+import argparse
+import asyncio
+import json
+import math
+import numpy as np
+import pandas as pd
+from export import REGIME_COLUMNS, read_all_data
+from batch_render import MapSpec, RenderPool, geoplotting_specs
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+MAX_BATCH = 10000
+MAX_BODY = 2 ** 20
+
+class LRUCache:
+    """
+    Least-recently-used cache of response bodies, bounded by entry count and total bytes.
+    """
+    def __init__(self, max_items=4096, max_bytes=256 * 2 ** 20):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self._items:
+            self.bytes -= len(self._items.pop(key))
+        self._items[key] = value
+        self.bytes += len(value)
+        while self._items and (len(self._items) > self.max_items or self.bytes > self.max_bytes):
+            _, evicted = self._items.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def stats(self):
+        return {'items': len(self._items), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+def _json_value(value):
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else round(float(value), 6)
+    if isinstance(value, (np.integer, np.bool_)):
+        return int(value)
+    return value
+
+def _parse_geoid(value):
+    """
+    A GEOID from a JSON integer or a string of ASCII digits. Anything int() would coerce
+    (1001.9, true, "+1001") is a ValueError.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    raise ValueError(f"invalid GEOID {value!r}")
+
+class GreenroofService:
+    """
+    Serves the exported county table over HTTP:
+
+        GET  /county/{geoid}          climate values and roof regimes of one county
+        GET  /counties?geoids=a,b,c   the same for many counties
+        POST /counties                with a JSON body {"geoids": [...]}
+        GET  /map/{variable}[?dpi=n]  choropleth PNG of a column (or of a map name like green_roof)
+        GET  /maps                    the variables /map knows about
+        GET  /stats                   cache statistics
+
+    The table and geometry load once; renders run in a RenderPool so the event loop never
+    waits on matplotlib, and identical renders requested concurrently share one job.
+    """
+    def __init__(self, all_data, specs=(), max_workers=None, cache_items=4096, cache_bytes=256 * 2 ** 20):
+        self.all_data = all_data
+        self.index = pd.Index(all_data['GEOID'])
+        self.columns = [c for c in all_data.columns if c != 'geometry']
+        self.specs = {}
+        for spec in specs:
+            self.specs[spec.column] = spec
+            if isinstance(spec.output_path, (str, Path)):
+                self.specs[Path(spec.output_path).stem] = spec
+        # any other measure or regime column can be mapped with a default style
+        for column in self.columns:
+            mappable = pd.api.types.is_float_dtype(all_data[column]) or column in REGIME_COLUMNS
+            if column not in self.specs and mappable:
+                self.specs[column] = MapSpec(column, None, 'RdYlBu_r', column + " by County", None)
+        self.cache = LRUCache(cache_items, cache_bytes)
+        self.pool = RenderPool(all_data, {spec.column for spec in self.specs.values()}, max_workers)
+        self._pending = {}
+
+    def close(self):
+        self.pool.close()
+
+    def county_json(self, geoid):
+        key = ('county', geoid)
+        body = self.cache.get(key)
+        if body is None:
+            position = self.index.get_indexer([geoid])[0]
+            if position < 0:
+                return None
+            row = self.all_data.iloc[position]
+            body = json.dumps({column: _json_value(row[column]) for column in self.columns}).encode()
+            self.cache.put(key, body)
+        return body
+
+    def counties_json(self, geoids):
+        found, missing = [], []
+        for geoid in geoids:
+            body = self.county_json(geoid)
+            if body is None:
+                missing.append(geoid)
+            else:
+                found.append(body)
+        return b'{"counties": [' + b', '.join(found) + b'], "missing": ' + json.dumps(missing).encode() + b'}'
+
+    async def map_png(self, name, dpi):
+        spec = self.specs[name]
+        key = ('map', spec.column, spec.title, dpi)
+        body = self.cache.get(key)
+        if body is not None:
+            return body
+        if key not in self._pending:
+            self._pending[key] = asyncio.wrap_future(self.pool.submit_png(spec, dpi))
+        try:
+            body = await asyncio.shield(self._pending[key])
+        finally:
+            self._pending.pop(key, None)
+        self.cache.put(key, body)
+        return body
+
+    async def dispatch(self, method, target, body):
+        """
+        Returns (status, content type, payload) for one request.
+        """
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        query = parse_qs(url.query)
+        try:
+            if parts[0] == 'county' and len(parts) == 2:
+                if method != 'GET':
+                    return 405, 'application/json', b'{"error": "use GET"}'
+                payload = self.county_json(_parse_geoid(parts[1]))
+                if payload is None:
+                    return 404, 'application/json', json.dumps({'error': 'unknown GEOID ' + parts[1]}).encode()
+                return 200, 'application/json', payload
+
+            if parts == ['counties']:
+                if method == 'POST':
+                    geoids = json.loads(body or b'{}').get('geoids', [])
+                    if not isinstance(geoids, list):
+                        raise ValueError("geoids must be a list")
+                elif method == 'GET':
+                    geoids = [geoid.strip() for geoid in ','.join(query.get('geoids', [])).split(',')]
+                    geoids = [geoid for geoid in geoids if geoid]
+                else:
+                    return 405, 'application/json', b'{"error": "use GET or POST"}'
+                geoids = [_parse_geoid(geoid) for geoid in geoids]
+                if len(geoids) > MAX_BATCH:
+                    return 413, 'application/json', json.dumps({'error': f"at most {MAX_BATCH} GEOIDs per request"}).encode()
+                return 200, 'application/json', self.counties_json(geoids)
+
+            if parts[0] == 'map' and len(parts) == 2:
+                if parts[1] not in self.specs:
+                    return 404, 'application/json', json.dumps({'error': 'unknown variable ' + parts[1]}).encode()
+                dpi = min(max(int(query.get('dpi', ['100'])[0]), 20), 300)
+                return 200, 'image/png', await self.map_png(parts[1], dpi)
+
+            if parts == ['maps']:
+                return 200, 'application/json', json.dumps(sorted(self.specs)).encode()
+            if parts == ['stats']:
+                stats = {'counties': len(self.all_data), 'cache': self.cache.stats(), 'rendering': len(self._pending)}
+                return 200, 'application/json', json.dumps(stats).encode()
+        except (ValueError, TypeError, AttributeError) as e:
+            # bad GEOIDs (e.g. null, 1001.9 or lists in a POST body), dpi or JSON bodies
+            return 400, 'application/json', json.dumps({'error': str(e)}).encode()
+        return 404, 'application/json', b'{"error": "not found"}'
+
+    async def handle(self, reader, writer):
+        """
+        asyncio.start_server callback: a minimal HTTP/1.1 loop with keep-alive.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    status, content_type, payload, version = 400, 'application/json', b'{"error": "bad request"}', 'HTTP/1.0'
+                else:
+                    if length > MAX_BODY:
+                        status, content_type, payload, version = 413, 'application/json', b'{"error": "body too large"}', 'HTTP/1.0'
+                    else:
+                        body = await reader.readexactly(length) if length else b''
+                        try:
+                            status, content_type, payload = await self.dispatch(method, target, body)
+                        except Exception as e:
+                            print(f"Error serving {target}: {e!r}")
+                            status, content_type, payload = 500, 'application/json', b'{"error": "internal error"}'
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                              f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(all_data_path, host='127.0.0.1', port=8000, max_workers=None, cache_mb=256, parent_path=None):
+    print("Loading " + str(all_data_path))
+    all_data = read_all_data(all_data_path, geometry=True)
+    specs = geoplotting_specs(parent_path) if parent_path else ()
+    service = GreenroofService(all_data, specs, max_workers, cache_bytes=cache_mb * 2 ** 20)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving {len(all_data)} counties on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve county recommendations and maps over HTTP.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/all_data.parquet")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, help="render processes (default one per CPU)")
+    parser.add_argument('--cache-mb', type=int, default=256, help="response cache size")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(Path(args.parent) / 'data/all_data.parquet', args.host, args.port,
+                          args.workers, args.cache_mb, args.parent))
+    except KeyboardInterrupt:
+        pass
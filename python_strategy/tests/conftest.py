@@ -0,0 +1,20 @@
+from pathlib import Path
+import shutil
+import sys
+import pytest
+
+# the modules are flat scripts next to this directory, imported the way the scripts import each other
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+FIXTURES = Path(__file__).resolve().parent / 'data'
+
+@pytest.fixture
+def county_root(tmp_path):
+    """
+    A copy of tests/data/county: 18 counties' NOAA files and continental.csv (one county missing
+    from cdd, one continental county in no file), plus all_data_baseline.csv, the csv the original
+    multi_plot.py wrote for them. Copied so caches are written under tmp_path.
+    """
+    root = tmp_path / 'county'
+    shutil.copytree(FIXTURES / 'county', root)
+    return root
@@ -0,0 +1,17 @@
+from analysis import NOAA_FILES, build_all_data
+
+def test_county_csv_matches_baseline(county_root):
+    files = [(name, county_root / path) for name, path in NOAA_FILES]
+    _, paths = build_all_data(files, county_root / 'data/continental.csv',
+                              output_path=county_root / 'out/all_data', export_format='csv')
+    assert paths == [county_root / 'out/all_data.csv']
+    assert paths[0].read_bytes() == (county_root / 'all_data_baseline.csv').read_bytes()
+
+def test_parquet_export_is_compact(county_root):
+    from export import read_all_data
+    files = [(name, county_root / path) for name, path in NOAA_FILES]
+    all_data, _ = build_all_data(files, county_root / 'data/continental.csv', output_path=county_root / 'out/all_data')
+    compact = read_all_data(county_root / 'out/all_data.parquet')
+    assert compact['HDD'].dtype == 'float32' and compact['HDD_per_CDD'].dtype == 'float32'
+    assert compact['STATEFP'].dtype == 'int64' and compact['GREEN ROOF'].dtype == 'int8'
+    assert (compact['HDD'].to_numpy() == all_data['HDD'].to_numpy()).all()
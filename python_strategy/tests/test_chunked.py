@@ -0,0 +1,15 @@
+import pandas as pd
+from analysis import NOAA_FILES, build_all_data
+from chunked import run_chunked
+
+def test_county_csv_matches_baseline(county_root):
+    paths = run_chunked(county_root, output_path=county_root / 'out/all_data', export_format='csv', chunksize=5)
+    assert paths == [county_root / 'out/all_data.csv']
+    assert paths[0].read_bytes() == (county_root / 'all_data_baseline.csv').read_bytes()
+
+def test_county_parquet_matches_in_memory_export(county_root):
+    files = [(name, county_root / path) for name, path in NOAA_FILES]
+    build_all_data(files, county_root / 'data/continental.csv', output_path=county_root / 'memory/all_data')
+    run_chunked(county_root, output_path=county_root / 'chunked/all_data', chunksize=5)
+    for name in ['all_data.parquet', 'all_data_geometry.parquet']:
+        assert pd.read_parquet(county_root / 'chunked' / name).equals(pd.read_parquet(county_root / 'memory' / name))
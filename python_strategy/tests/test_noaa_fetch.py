@@ -0,0 +1,74 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import pytest
+from noaa_fetch import STATE_FILE, NoaaSeries, fetch_all, make_session, read_state
+
+CSV = (b"# Title: February 2024 - January 2025 Contiguous U.S. County Heating Degree Days\n"
+       b"ID,Name,State,Value\nAL-001,Autauga County,Alabama,2113\n")
+
+class StandIn(BaseHTTPRequestHandler):
+    """
+    Climate at a Glance stand-in: hdd is a CSV with an ETag, cdd always fails with 503 and
+    pmdi answers 200 with an HTML page.
+    """
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('If-None-Match')))
+        parameter = self.path.strip('/').split('/')[0]
+        if parameter == 'hdd' and self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        status, body = {'hdd': (200, CSV), 'pmdi': (200, b"<html>maintenance</html>")}.get(parameter, (503, b"busy"))
+        self.send_response(status)
+        if parameter == 'hdd':
+            self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def base_url():
+    StandIn.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+def fetch(series, store_dir, base_url):
+    session = make_session(retries=2, backoff=0)
+    try:
+        return fetch_all(series, store_dir, base_url, max_workers=1, session=session)
+    finally:
+        session.close()
+
+def test_download_then_not_modified(tmp_path, base_url):
+    series = [NoaaSeries('hdd', 2025, 1, 12, 'hdd_with_meta.csv')]
+    assert [result.status for result in fetch(series, tmp_path, base_url)] == ['downloaded']
+    assert (tmp_path / 'hdd_with_meta.csv').read_bytes() == CSV
+    assert read_state(tmp_path / STATE_FILE)['hdd_with_meta.csv']['etag'] == '"v1"'
+
+    assert [result.status for result in fetch(series, tmp_path, base_url)] == ['unchanged']
+    assert StandIn.requests[-1] == ('/hdd/202501/12/value.csv', '"v1"')
+    assert (tmp_path / 'hdd_with_meta.csv').read_bytes() == CSV
+
+def test_server_errors_are_retried_then_failed(tmp_path, base_url):
+    (result,) = fetch([NoaaSeries('cdd', 2025, 1, 12, 'cdd_with_meta.csv')], tmp_path, base_url)
+    assert result.status == 'failed' and '503' in result.error
+    # the first attempt and two retries
+    assert len(StandIn.requests) == 3
+    assert list(tmp_path.iterdir()) == [tmp_path / STATE_FILE]
+
+def test_non_csv_body_is_rejected(tmp_path, base_url):
+    (tmp_path / 'palmer.csv').write_bytes(CSV)
+    (result,) = fetch([NoaaSeries('pmdi', 2025, 8, 1, 'palmer.csv')], tmp_path, base_url)
+    assert result.status == 'failed' and 'not a Climate at a Glance CSV' in result.error
+    # the previous copy is kept and no partial file is left behind
+    assert (tmp_path / 'palmer.csv').read_bytes() == CSV
+    assert not (tmp_path / 'palmer.csv.part').exists()
@@ -0,0 +1,18 @@
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.image as mpimg
+from analysis import NOAA_FILES, build_all_data
+from batch_render import geoplotting_specs
+from raster_render import load_label_grid, render_raster_map
+
+def test_raster_maps_render_every_spec(county_root):
+    files = [(name, county_root / path) for name, path in NOAA_FILES]
+    all_data, _ = build_all_data(files, county_root / 'data/continental.csv', output_path=county_root / 'out/all_data')
+    label_grid = load_label_grid(county_root / 'data/continental.csv', 20000.)
+    specs = [spec for spec in geoplotting_specs(image_dir=county_root / 'image')
+             if spec.column in ('GREEN ROOF', 'HDD_per_CDD')]
+    for spec in specs:
+        output_path = render_raster_map(label_grid, all_data, spec, dpi=50)
+        image = mpimg.imread(output_path)
+        # title and legend or colorbar make the figure wider than the bare grid
+        assert image.shape[1] > label_grid.grid.shape[1]
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+from savings import MODEL_PARAMETERS, configuration_grid, evaluate_grid, model_inputs
+
+def counties(geoids):
+    return pd.DataFrame({'GEOID': geoids, 'HDD': [5000., 2000., 5000.], 'CDD': [800., 2500., 800.],
+                         'MIN TEMP': [10., 40., 10.], 'MAX TEMP': [85., 95., 85.],
+                         'PALMER MOD INDEX': [0., -2., 0.]})
+
+def test_county_without_precipitation_gets_full_precipitation():
+    all_data = counties([1001, 1003, 1005])
+    precipitation = pd.DataFrame({'GEOID': [1001, 1003], 'PRECIPITATION': [55., 20.]})
+    configurations = configuration_grid(albedo=(0.3, 0.65), depth=(4., 8.))
+    result = evaluate_grid(model_inputs(all_data, precipitation), configurations)
+    assert np.isfinite(result.best_total).all() and np.isfinite(result.mean_total).all()
+
+    # 1005 is 1001's climate, and 55 inches is already above full_precipitation
+    full = all_data.assign(PRECIPITATION=[55., 20., MODEL_PARAMETERS['full_precipitation']])
+    expected = evaluate_grid(model_inputs(full), configurations)
+    np.testing.assert_array_equal(result.total, expected.total)
+    assert result.best_total[2] == result.best_total[0]
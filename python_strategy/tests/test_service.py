@@ -0,0 +1,37 @@
+import asyncio
+import json
+import pytest
+from analysis import NOAA_FILES, build_all_data
+from service import GreenroofService
+
+@pytest.fixture
+def service(county_root):
+    files = [(name, county_root / path) for name, path in NOAA_FILES]
+    all_data, _ = build_all_data(files, county_root / 'data/continental.csv', output_path=county_root / 'out/all_data')
+    service = GreenroofService(all_data, max_workers=1)
+    yield service
+    service.close()
+
+def request(service, method, target, body=b''):
+    status, _, payload = asyncio.run(service.dispatch(method, target, body))
+    return status, json.loads(payload)
+
+def test_counties_by_integer_or_digit_string(service):
+    geoid = int(service.all_data['GEOID'].iloc[0])
+    status, payload = request(service, 'POST', '/counties', json.dumps({'geoids': [geoid, str(geoid), 99999]}).encode())
+    assert status == 200
+    assert [county['GEOID'] for county in payload['counties']] == [geoid, geoid]
+    assert payload['missing'] == [99999]
+    status, payload = request(service, 'GET', f'/counties?geoids={geoid}, {geoid},')
+    assert status == 200 and len(payload['counties']) == 2
+
+@pytest.mark.parametrize('body', [{'geoids': [1001.9]}, {'geoids': [True]}, {'geoids': ['+1001']},
+                                  {'geoids': [None]}, {'geoids': [[1001]]}, {'geoids': '1001'},
+                                  {'geoids': 1001}, [1001]])
+def test_counties_rejects_coercible_geoids(service, body):
+    status, payload = request(service, 'POST', '/counties', json.dumps(body).encode())
+    assert status == 400 and 'error' in payload
+
+def test_county_rejects_signed_geoid(service):
+    assert request(service, 'GET', '/county/-1001')[0] == 400
+    assert request(service, 'GET', '/counties?geoids=1001.9')[0] == 400
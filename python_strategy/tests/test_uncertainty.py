@@ -0,0 +1,34 @@
+import json
+import numpy as np
+from cube import Cube
+from uncertainty import SAMPLED, Climatology, anomaly_spread, interannual_spread
+
+def write_cube(cube_dir, geoids, years, rng):
+    cube_dir.mkdir()
+    (cube_dir / 'meta.json').write_text(json.dumps({'variables': ['tmin', 'tmax', 'hdd', 'cdd'],
+                                                    'years': [years[0], years[-1]]}))
+    np.save(cube_dir / 'geoids.npy', np.asarray(geoids))
+    for variable in ['tmin', 'tmax', 'hdd', 'cdd']:
+        normals = rng.uniform(0., 100., (12, len(geoids))).astype(np.float32)
+        values = normals + rng.normal(0., 3., (len(years), 12, len(geoids))).astype(np.float32)
+        np.save(cube_dir / f"{variable}.npy", values)
+        np.save(cube_dir / f"{variable}_normals.npy", normals)
+    return Cube(cube_dir)
+
+def test_spread_is_the_standard_deviation_over_the_years(tmp_path):
+    rng = np.random.default_rng(0)
+    cube = write_cube(tmp_path / 'cube', [1001, 1003], list(range(1980, 2020)), rng)
+    # 1005 is not in the cube
+    geoids = np.array([1001, 1003, 1005])
+    anomaly = rng.normal(0., 1., (len(SAMPLED), len(geoids)))
+    climatology = Climatology(geoids, anomaly, np.zeros_like(anomaly), anomaly)
+    spread, measured = interannual_spread(climatology, cube)
+
+    assert measured[:, :2].all() and not measured[:, 2].any()
+    jan = SAMPLED.index('MIN TEMP JAN')
+    np.testing.assert_allclose(spread[jan, 0], np.std(cube.anomaly('tmin')[:, 0, 0], ddof=1), rtol=1e-6)
+    hdd = SAMPLED.index('HDD')
+    np.testing.assert_allclose(spread[hdd, 1], np.std(cube.anomaly('hdd')[:, :, 1].sum(axis=1), ddof=1), rtol=1e-6)
+    # twelve months of N(0, 3) anomalies sum to a spread near 3 * sqrt(12)
+    assert 6. < spread[hdd, 0] < 15.
+    np.testing.assert_array_equal(spread[:, 2], anomaly_spread(climatology)[:, 2])
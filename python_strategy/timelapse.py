@@ -0,0 +1,192 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import calendar
+import os
+import shutil
+import tempfile
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.colors as colors
+from matplotlib import animation
+import geopandas as gpd
+from batch_render import MapSpec
+from export import read_all_data
+
+# county frame and renderer built once per worker process by _init_worker
+_worker_renderer = None
+
+class FrameRenderer:
+    """
+    A geoplotting.BaseMap at a fixed frame size: the county patches are built once, and every
+    frame only swaps face colors and the title before drawing to an RGBA array.
+    """
+    def __init__(self, geometry, spec, dpi=100):
+        from geoplotting import BaseMap
+        self.spec = spec
+        self.base = BaseMap(geometry, spec.figsize)
+        self.base.fig.set_dpi(dpi)
+
+    def render(self, values, title):
+        spec = self.spec
+        if spec.labels is not None:
+            self.base.render_categorical(values, spec.labels, list(spec.cmap.colors), title,
+                                         categories=list(spec.labels.values()))
+        else:
+            self.base.render(values, spec.cmap, spec.norm, title, spec.label)
+        self.base.fig.canvas.draw()
+        return np.asarray(self.base.fig.canvas.buffer_rgba()).copy()
+
+    def close(self):
+        self.base.close()
+
+def _init_worker(geometry_path, spec, dpi):
+    global _worker_renderer
+    matplotlib.use('Agg')
+    _worker_renderer = FrameRenderer(gpd.read_parquet(geometry_path), spec, dpi)
+
+def _render_in_worker(values, title):
+    return _worker_renderer.render(values, title)
+
+def _render_frames(geometry, frames, spec, dpi, max_workers, ahead):
+    """
+    Yields the RGBA array of every (values, title) frame in order. Worker processes each draw
+    the geometry once; at most ahead frames are in flight, so finished frames waiting for an
+    earlier one never pile up.
+    """
+    if max_workers == 1:
+        renderer = FrameRenderer(geometry, spec, dpi)
+        try:
+            for values, title in frames:
+                yield renderer.render(values, title)
+        finally:
+            renderer.close()
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix='greenroof_timelapse_')
+    geometry_path = Path(tmp_dir) / 'geometry.parquet'
+    geometry[['geometry']].to_parquet(geometry_path)
+    executor = ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(str(geometry_path), spec, dpi))
+    try:
+        pending = deque()
+        for values, title in frames:
+            pending.append(executor.submit(_render_in_worker, np.asarray(values), title))
+            if len(pending) >= ahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def movie_writer(output_path, fps):
+    """
+    ffmpeg for .mp4 (and .gif when ffmpeg is installed) streams frames through a pipe.
+    Without ffmpeg a .gif falls back to Pillow, which holds the frames until the end.
+    """
+    if animation.writers.is_available('ffmpeg'):
+        return animation.FFMpegWriter(fps=fps)
+    if Path(output_path).suffix.lower() == '.gif':
+        return animation.PillowWriter(fps=fps)
+    raise RuntimeError(f"writing {output_path} needs ffmpeg on the PATH; a .gif works without it")
+
+def write_timelapse(geometry, frames, spec, output_path, fps=4, dpi=100, max_workers=1, ahead=None):
+    """
+    Streams (values, title) frames, values per geometry row, into an MP4 or GIF at output_path.
+    spec styles every frame the same way (cmap, and norm or labels, which must not change between
+    frames); spec.column and spec.output_path are unused. Frames are rendered by max_workers
+    processes (None: one per CPU) and written in order as they arrive, so only the frames in
+    flight are in memory, however long the animation. Returns the number of frames written.
+    """
+    if spec.labels is None and spec.norm is None:
+        raise ValueError("spec.norm is required for continuous frames, or colors would change meaning per frame")
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    max_workers = max_workers or os.cpu_count() or 1
+    ahead = ahead or 2 * max_workers
+
+    count = 0
+    writer = movie_writer(output_path, fps)
+    fig = None
+    try:
+        for rgba in _render_frames(geometry, frames, spec, dpi, max_workers, ahead):
+            if fig is None:
+                # a plain full-bleed image the writer grabs; the maps are drawn elsewhere
+                height, width = rgba.shape[:2]
+                fig = plt.figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+                ax = fig.add_axes([0, 0, 1, 1])
+                ax.set_axis_off()
+                image = ax.imshow(rgba, interpolation='none')
+                writer.setup(fig, output_path, dpi)
+            else:
+                image.set_data(rgba)
+            writer.grab_frame()
+            count += 1
+        if fig is not None:
+            writer.finish()
+    finally:
+        if fig is not None:
+            plt.close(fig)
+    return count
+
+def cube_frames(cube, variable, geoids, years, months):
+    """
+    (values, title) for every month of every year from a cube.Cube, values aligned to geoids.
+    Slices are read from the memory-mapped cube as the frames are consumed.
+    """
+    positions = cube.geoids.get_indexer(np.asarray(geoids))
+    for year in years:
+        for month in months:
+            values = np.asarray(cube[variable][year - cube.years[0], month - 1])
+            yield np.where(positions >= 0, values[positions], np.nan), f"{calendar.month_name[month]} {year}"
+
+def regime_frames(codes, cube, geoids, years, name):
+    """
+    (codes, title) per year from cube.classify_years output, aligned to geoids.
+    """
+    positions = cube.geoids.get_indexer(np.asarray(geoids))
+    for year in years:
+        yield np.where(positions >= 0, codes[year - cube.years[0]][positions], 0), f"{name} {year}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Animate monthly climate or yearly roof regimes from the climate cube.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--cube', default='data/cache/cube', help="cube directory, relative to --parent (see cube.py)")
+    parser.add_argument('--variable', help="animate this cube variable month by month, e.g. tmax")
+    parser.add_argument('--regime', choices=['GREEN ROOF', 'COOL ROOF'], help="animate this regime year by year")
+    parser.add_argument('--years', help="e.g. 1990-2025 (default every year in the cube)")
+    parser.add_argument('--months', nargs='+', type=int, default=list(range(1, 13)))
+    parser.add_argument('--output', help="mp4 or gif (default image/<variable or regime>.mp4)")
+    parser.add_argument('--fps', type=int, default=4)
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--workers', type=int, help="render processes (default one per CPU)")
+    args = parser.parse_args()
+    if not (args.variable or args.regime):
+        parser.error("give --variable or --regime")
+    matplotlib.use('Agg')
+    from cube import Cube, classify_years
+    from noaa_fetch import parse_years
+
+    parent_path = Path(args.parent)
+    cube = Cube(parent_path / args.cube)
+    years = parse_years(args.years) if args.years else list(cube.years)
+    geometry = read_all_data(parent_path / 'data/all_data.parquet', [], geometry=True)
+    name = args.variable or args.regime
+    output_path = Path(args.output) if args.output else parent_path / 'image' / (name.lower().replace(' ', '_') + '.mp4')
+
+    if args.variable:
+        selected = np.asarray(cube[args.variable][years[0] - cube.years[0]:years[-1] - cube.years[0] + 1])
+        low, high = np.nanpercentile(selected, [1, 99])
+        spec = MapSpec(args.variable, colors.Normalize(low, high), 'RdYlBu_r', None, None, label=args.variable)
+        frames = cube_frames(cube, args.variable, geometry['GEOID'], years, args.months)
+    else:
+        from batch_render import geoplotting_specs
+        spec = next(spec for spec in geoplotting_specs(parent_path) if spec.column == args.regime)
+        spec = spec._replace(title=None, output_path=None, figsize=(10, 6))
+        codes = classify_years(cube, regimes=[args.regime])[args.regime]
+        frames = regime_frames(codes, cube, geometry['GEOID'], years, args.regime)
+    count = write_timelapse(geometry, frames, spec, output_path, args.fps, args.dpi, args.workers)
+    print(f"Wrote {count} frames to {output_path}")
@@ -0,0 +1,225 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import itertools
+import warnings
+import numpy as np
+import pandas as pd
+from noaa_loader import load_noaa_files
+from geoid_join import align_on_geoid
+from analysis import NOAA_FILES
+from geoid import convert_geoid_data_to_number
+from regimes import REGIMES, classify
+from export import read_all_data
+
+# the NOAA columns the GREEN ROOF / COOL ROOF rules read, directly or through MIN/MAX TEMP
+SAMPLED = ['HDD', 'CDD', 'MIN TEMP JAN', 'MIN TEMP FEB', 'MIN TEMP DEC', 'MAX TEMP JUN', 'MAX TEMP JUL', 'MAX TEMP AUG']
+# a warm year raises every temperature and CDD and lowers HDD
+WARM_SIGN = np.array([-1. if name == 'HDD' else 1. for name in SAMPLED])
+UNCERTAIN_REGIMES = ['GREEN ROOF', 'COOL ROOF']
+# the cube variable and months behind each SAMPLED column (see cube.build_cube)
+CUBE_SOURCES = {'HDD': ('hdd', range(1, 13)), 'CDD': ('cdd', range(1, 13)),
+                'MIN TEMP JAN': ('tmin', [1]), 'MIN TEMP FEB': ('tmin', [2]), 'MIN TEMP DEC': ('tmin', [12]),
+                'MAX TEMP JUN': ('tmax', [6]), 'MAX TEMP JUL': ('tmax', [7]), 'MAX TEMP AUG': ('tmax', [8])}
+
+# (variables, counties) arrays in SAMPLED order; value is the latest period, mean the
+# 1901-2000 mean, anomaly = value - mean
+Climatology = namedtuple('Climatology', ['geoids', 'value', 'mean', 'anomaly'])
+
+def load_climatology(parent_path, geoids=None):
+    """
+    Value, Anomaly and 1901-2000 Mean of every SAMPLED variable, on the counties present in
+    every file (and in geoids, e.g. continental['GEOID'], if given).
+    """
+    files = [(name, Path(parent_path) / path) for name, path in NOAA_FILES if name in SAMPLED]
+    sources = []
+    for (name, _), noaa_file in zip(files, load_noaa_files([path for _, path in files], extra=('Anomaly', '1901-2000 Mean'))):
+        data = convert_geoid_data_to_number(noaa_file.data, 'ID')
+        sources.append(pd.DataFrame({'GEOID': data['ID'], name: data['Value'],
+                                     name + ' anomaly': data['Anomaly'], name + ' mean': data['1901-2000 Mean']}))
+    aligned, _ = align_on_geoid(sources, how='inner', index=geoids)
+    def stack(suffix):
+        return np.stack([aligned[name + suffix].to_numpy(dtype=np.float64) for name in SAMPLED])
+    return Climatology(aligned['GEOID'].to_numpy(), stack(''), stack(' mean'), stack(' anomaly'))
+
+def anomaly_spread(climatology):
+    """
+    (variables, counties) root mean square of the latest period's anomalies over the county's
+    state. This is how far one year sat from the 1901-2000 mean across the state, not the
+    year-to-year spread; it is only the fallback where interannual_spread has no history.
+    """
+    states = np.unique(climatology.geoids // 1000, return_inverse=True)[1]
+    anomaly = np.nan_to_num(climatology.anomaly)
+    counts = np.bincount(states)
+    spread = np.empty(anomaly.shape)
+    for i in range(len(SAMPLED)):
+        spread[i] = np.sqrt(np.bincount(states, weights=anomaly[i] ** 2) / counts)[states]
+    return spread
+
+def interannual_spread(climatology, cube, min_years=10):
+    """
+    (variables, counties) standard deviation over the cube's years of each SAMPLED variable's
+    anomaly from the 1901-2000 monthly mean: the month itself for the temperatures, the
+    calendar-year sum for HDD/CDD. Returns (spread, measured); where a county has fewer than
+    min_years complete years in the cube, measured is False and spread is anomaly_spread.
+    """
+    positions = cube.geoids.get_indexer(climatology.geoids)
+    spread = anomaly_spread(climatology)
+    measured = np.zeros(spread.shape, dtype=bool)
+    anomalies = {}
+    for i, name in enumerate(SAMPLED):
+        variable, months = CUBE_SOURCES[name]
+        if variable not in cube.variables:
+            continue
+        if variable not in anomalies:
+            anomalies[variable] = cube.anomaly(variable)[:, :, np.maximum(positions, 0)]
+        # NaN unless every month of the year is known
+        yearly = anomalies[variable][:, np.asarray(months) - 1, :].sum(axis=1, dtype=np.float64)
+        with warnings.catch_warnings():
+            # counties with no history are expected
+            warnings.simplefilter('ignore', RuntimeWarning)
+            std = np.nanstd(yearly, axis=0, ddof=1)
+        measured[i] = (np.isfinite(yearly).sum(axis=0) >= max(min_years, 2)) & (positions >= 0)
+        spread[i, measured[i]] = std[measured[i]]
+    return spread, measured
+
+def sample_years(climatology, spread, n_samples, rng, correlation=0.7, center='mean'):
+    """
+    Draws n_samples plausible years per county: SAMPLED name -> (samples, counties) float32.
+    Each sample is center ('mean': the 1901-2000 mean, 'value': the latest period) plus spread
+    times a normal deviate; a shared warm/cold factor gives the variables of a sample the given
+    correlation, so a hot summer comes with high CDD rather than independent of it.
+    """
+    base = (climatology.mean if center == 'mean' else climatology.value).astype(np.float32)
+    spread = spread.astype(np.float32)
+    n_counties = base.shape[1]
+    common = rng.standard_normal((n_samples, n_counties), dtype=np.float32)
+    own = np.float32(np.sqrt(1. - correlation ** 2))
+    samples = {}
+    for i, name in enumerate(SAMPLED):
+        # in place and in float32, this is most of the run time
+        sample = rng.standard_normal((n_samples, n_counties), dtype=np.float32)
+        sample *= own
+        sample += np.float32(correlation * WARM_SIGN[i]) * common
+        sample *= spread[i]
+        sample += base[i]
+        samples[name] = sample
+    np.maximum(samples['HDD'], 0., out=samples['HDD'])
+    np.maximum(samples['CDD'], 0., out=samples['CDD'])
+    return samples
+
+def _count_codes(climatology, spread, n_samples, seed, thresholds, correlation, center):
+    """
+    Samples one batch and returns regime name -> (codes, counties) counts of each code.
+    """
+    samples = sample_years(climatology, spread, n_samples, np.random.default_rng(seed), correlation, center)
+    # the same derived columns as analysis.analyze_data
+    samples['MIN TEMP'] = np.minimum(np.minimum(samples['MIN TEMP JAN'], samples['MIN TEMP FEB']), samples['MIN TEMP DEC'])
+    samples['MAX TEMP'] = np.maximum(np.maximum(samples['MAX TEMP JUN'], samples['MAX TEMP JUL']), samples['MAX TEMP AUG'])
+    shape = samples['HDD'].shape
+    codes = classify({name: values.ravel() for name, values in samples.items()}, thresholds, UNCERTAIN_REGIMES)
+    counts = {}
+    for regime in REGIMES:
+        if regime.name in codes:
+            code = codes[regime.name].reshape(shape)
+            counts[regime.name] = np.stack([(code == level).sum(axis=0) for level in range(len(regime.levels) + 1)])
+    return counts
+
+def regime_probabilities(climatology, n_samples=10000, batch_size=500, max_workers=1, seed=0,
+                         thresholds=None, correlation=0.7, center='mean', spread=None):
+    """
+    Per county probability of every regime code over n_samples sampled years, as a frame of
+    GEOID plus 'P <regime>' (any advisable code) and 'P <regime> <code>' for multi-level regimes.
+    Batches of batch_size samples run as (samples, counties) arrays; with max_workers > 1 (None:
+    one per CPU) they run in worker processes. Every batch has its own seed from seed, so the
+    result does not depend on the number of workers. spread is the (variables, counties) standard
+    deviation of a year, e.g. from interannual_spread; by default the anomaly_spread fallback.
+    """
+    if spread is None:
+        spread = anomaly_spread(climatology)
+    sizes = [min(batch_size, n_samples - start) for start in range(0, n_samples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = (itertools.repeat(climatology), itertools.repeat(spread), sizes, seeds,
+            itertools.repeat(thresholds), itertools.repeat(correlation), itertools.repeat(center))
+    executor = ProcessPoolExecutor(max_workers) if max_workers != 1 else None
+    try:
+        totals = {}
+        for counts in (map(_count_codes, *args) if executor is None else executor.map(_count_codes, *args)):
+            for name, count in counts.items():
+                totals[name] = totals[name] + count if name in totals else count.astype(np.int64)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    result = pd.DataFrame({'GEOID': climatology.geoids})
+    for name, count in totals.items():
+        result['P ' + name] = 1. - count[0] / n_samples
+        if len(count) > 2:
+            for level in range(1, len(count)):
+                result[f"P {name} {level}"] = count[level] / n_samples
+    return result
+
+def probability_specs(columns, image_dir):
+    """
+    One 0-1 MapSpec per probability column, drawn to image_dir/uncertainty_<column>.png.
+    """
+    import matplotlib.colors as colors
+    from batch_render import MapSpec
+    specs = []
+    for column in columns:
+        name, _, level = column[2:].rpartition(' ')
+        title = f"Probability of {name} Code {level}" if level.isdigit() else f"Probability {column[2:]} is Advisable"
+        specs.append(MapSpec(column, colors.Normalize(0., 1.), 'YlGn', title,
+                             Path(image_dir) / ("uncertainty_" + column[2:].lower().replace(' ', '_') + ".png"),
+                             label="Share of sampled years", figsize=(20, 12)))
+    return specs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo probability of each roof regime per county.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/")
+    parser.add_argument('--samples', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=500, help="samples per batch")
+    parser.add_argument('--workers', type=int, default=1, help="processes, 0 for one per CPU")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--correlation', type=float, default=0.7, help="between the variables of one sampled year")
+    parser.add_argument('--center', choices=['mean', 'value'], default='mean',
+                        help="sample around the 1901-2000 mean or the latest period")
+    parser.add_argument('--cube', default='data/cache/cube',
+                        help="climate cube for the year-to-year spread, relative to --parent (see cube.py --build)")
+    parser.add_argument('--min-years', type=int, default=10, help="years of cube history needed per county")
+    parser.add_argument('--output', help="write the probabilities to this csv")
+    parser.add_argument('--render', action='store_true', help="draw the probability maps to image/")
+    args = parser.parse_args()
+
+    parent_path = Path(args.parent)
+    geoids = pd.read_csv(parent_path / 'data/continental.csv', usecols=['GEOID'])['GEOID']
+    climatology = load_climatology(parent_path, geoids)
+    cube_dir = parent_path / args.cube
+    if (cube_dir / 'meta.json').exists():
+        from cube import Cube
+        cube = Cube(cube_dir)
+        spread, measured = interannual_spread(climatology, cube, args.min_years)
+        print(f"Spread from {cube.years[0]}-{cube.years[-1]} for {measured.mean():.1%} of county variables, "
+              f"the rest from the state anomaly")
+    else:
+        print(f"Warning: no cube in {cube_dir}, the spread is only the state RMS of the latest anomalies")
+        spread = None
+    probabilities = regime_probabilities(climatology, args.samples, args.batch_size, args.workers or None,
+                                         args.seed, correlation=args.correlation, center=args.center,
+                                         spread=spread)
+    columns = [column for column in probabilities.columns if column != 'GEOID']
+    print(f"{args.samples} samples x {len(probabilities)} counties")
+    print(probabilities[columns].describe().to_string())
+    if args.output:
+        probabilities.to_csv(args.output, index=False)
+        print("Data saved " + args.output)
+    if args.render:
+        import matplotlib
+        matplotlib.use('Agg')
+        from batch_render import render_batch
+        all_data = read_all_data(parent_path / 'data/all_data.parquet', [], geometry=True)
+        all_data = all_data.merge(probabilities, on='GEOID')
+        for output_path in render_batch(all_data, probability_specs(columns, parent_path / 'image'), args.workers or None):
+            print("Map saved " + output_path)
@@ -0,0 +1,285 @@
+from collections import namedtuple
+from pathlib import Path
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+import shapely
+from export import read_all_data
+
+# analysis columns shipped to the web viewer by default
+DEFAULT_COLUMNS = ['HDD', 'CDD', 'HDD_per_CDD', 'MIN TEMP', 'MAX TEMP', 'GREEN ROOF', 'COOL ROOF']
+WGS84 = "EPSG:4326"
+WEB_MERCATOR = "EPSG:3857"
+MERCATOR_HALF_WORLD = 20037508.342789244
+
+# arcs are (k, 2) int64 arrays of absolute quantized coordinates. objects has one entry per input
+# geometry: a list of polygons, each a list of rings, each a list of arc references where ~i means
+# arc i reversed (TopoJSON's convention). A quantized point is translate + point * scale.
+Topology = namedtuple('Topology', ['arcs', 'objects', 'scale', 'translate'])
+
+def build_topology(geometry, quantization=100000):
+    """
+    Quantizes polygons onto a quantization x quantization grid over their bounds and splits
+    every ring into arcs at junctions (points whose neighbours differ between the rings that
+    share them), so each border between two counties is stored once.
+    """
+    geometry = shapely.orient_polygons(np.asarray(geometry), exterior_cw=True)
+    minx, miny, maxx, maxy = shapely.total_bounds(geometry)
+    scale = np.array([(maxx - minx) / (quantization - 1) or 1., (maxy - miny) / (quantization - 1) or 1.])
+    translate = np.array([minx, miny])
+
+    polygons, polygon_geom = shapely.get_parts(geometry, return_index=True)
+    rings, ring_polygon = shapely.get_rings(polygons, return_index=True)
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+    points = np.round((coords - translate) / scale).astype(np.int64)
+
+    # drop the closing point and any point quantization merged into its predecessor
+    ring_start = np.r_[True, coord_ring[1:] != coord_ring[:-1]]
+    ring_end = np.r_[coord_ring[1:] != coord_ring[:-1], True]
+    repeated = np.r_[False, (points[1:] == points[:-1]).all(axis=1)] & ~ring_start
+    keep = ~ring_end & ~repeated
+    points, coord_ring = points[keep], coord_ring[keep]
+    starts = np.searchsorted(coord_ring, np.arange(len(rings)))
+    ends = np.searchsorted(coord_ring, np.arange(len(rings)), side='right')
+
+    # neighbours of every ring point, wrapping around within the ring
+    index = np.arange(len(points))
+    prev = np.where(index == starts[coord_ring], ends[coord_ring] - 1, index - 1)
+    nxt = np.where(index == ends[coord_ring] - 1, starts[coord_ring], index + 1)
+    key = points[:, 0] * (quantization + 1) + points[:, 1]
+    lo = np.minimum(key[prev], key[nxt])
+    hi = np.maximum(key[prev], key[nxt])
+    order = np.lexsort((hi, lo, key))
+    differs = (key[order][1:] == key[order][:-1]) & ((lo[order][1:] != lo[order][:-1]) | (hi[order][1:] != hi[order][:-1]))
+    is_junction = np.isin(key, key[order][1:][differs])
+
+    arcs, arc_index = [], {}
+
+    def arc_ref(arc):
+        forward = arc.tobytes()
+        if forward in arc_index:
+            return arc_index[forward]
+        backward = arc[::-1].tobytes()
+        if backward in arc_index:
+            return ~arc_index[backward]
+        arc_index[forward] = len(arcs)
+        arcs.append(arc)
+        return len(arcs) - 1
+
+    ring_arcs = []
+    for start, end in zip(starts, ends):
+        ring = points[start:end]
+        if len(ring) < 3:
+            # collapsed to a point or a line by quantization
+            ring_arcs.append(None)
+            continue
+        junctions = np.flatnonzero(is_junction[start:end])
+        if len(junctions) == 0:
+            # one closed arc, started at its smallest point so a ring shared in full (an enclave) matches
+            ring = np.roll(ring, -int(np.argmin(key[start:end])), axis=0)
+            ring_arcs.append([arc_ref(np.vstack([ring, ring[:1]]))])
+            continue
+        ring = np.roll(ring, -int(junctions[0]), axis=0)
+        ring = np.vstack([ring, ring[:1]])
+        cuts = np.r_[junctions - junctions[0], len(ring) - 1]
+        ring_arcs.append([arc_ref(ring[a:b + 1]) for a, b in zip(cuts[:-1], cuts[1:])])
+
+    objects = [[] for _ in range(len(geometry))]
+    # rings come grouped by polygon, exterior first; a polygon whose exterior collapsed is dropped
+    polygon_rings = [[] for _ in range(len(polygons))]
+    for r, p in enumerate(ring_polygon):
+        polygon_rings[p].append(ring_arcs[r])
+    for p, rings_of_polygon in enumerate(polygon_rings):
+        if rings_of_polygon and rings_of_polygon[0] is not None:
+            objects[polygon_geom[p]].append([ring for ring in rings_of_polygon if ring is not None])
+    return Topology(arcs, objects, scale, translate)
+
+def simplify_arcs(arcs, tolerance):
+    """
+    Douglas-Peucker on every arc with tolerance in quantized units. Arc end points always stay,
+    so neighbouring counties stay seamless; arcs keep enough points that no ring collapses.
+    """
+    if tolerance <= 0 or not arcs:
+        return list(arcs)
+    lengths = np.array([len(arc) for arc in arcs])
+    lines = shapely.linestrings(np.concatenate(arcs), indices=np.repeat(np.arange(len(arcs)), lengths))
+    simplified = shapely.simplify(lines, tolerance, preserve_topology=False)
+    counts = shapely.get_num_coordinates(simplified)
+    coords = np.round(shapely.get_coordinates(simplified)).astype(np.int64)
+    offsets = np.r_[0, np.cumsum(counts)]
+    result = []
+    for arc, start, stop in zip(arcs, offsets[:-1], offsets[1:]):
+        closed = (arc[0] == arc[-1]).all()
+        minimum = min(len(arc), 4 if closed else 3)
+        if stop - start >= minimum:
+            result.append(coords[start:stop])
+        else:
+            result.append(arc[np.unique(np.linspace(0, len(arc) - 1, minimum).round().astype(int))])
+    return result
+
+def _ring_coords(arcs, refs):
+    parts = []
+    for i, ref in enumerate(refs):
+        arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+        parts.append(arc if i == 0 else arc[1:])
+    return np.concatenate(parts)
+
+def topology_geometry(topology, arcs=None):
+    """
+    Rebuilds shapely geometries (in the original CRS) from a topology, optionally with other
+    arcs such as simplify_arcs output.
+    """
+    arcs = topology.arcs if arcs is None else arcs
+    geometry = []
+    for polygons in topology.objects:
+        parts = []
+        for rings in polygons:
+            rings = [_ring_coords(arcs, refs) * topology.scale + topology.translate for refs in rings]
+            parts.append(shapely.Polygon(rings[0], rings[1:]))
+        geometry.append(None if not parts else parts[0] if len(parts) == 1 else shapely.MultiPolygon(parts))
+    return np.array(geometry, dtype=object)
+
+def _properties(all_data, columns, decimals=2):
+    """
+    One JSON-ready dict per row; measures are rounded and NaN becomes null.
+    """
+    frame = all_data[columns].copy()
+    for column in columns:
+        if pd.api.types.is_float_dtype(frame[column]):
+            # JSON has no Infinity (HDD_per_CDD where CDD is 0), so non-finite values become null too
+            values = frame[column].astype(np.float64)
+            frame[column] = values.round(decimals).where(np.isfinite(values))
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict('records')
+
+def to_topojson(all_data, columns=DEFAULT_COLUMNS, quantization=100000, simplify=0., object_name='counties'):
+    """
+    Quantized TopoJSON (lon/lat, delta-encoded arcs shared between neighbours) of a county
+    GeoDataFrame. simplify is a Douglas-Peucker tolerance in quantized units.
+    """
+    topology = build_topology(all_data.to_crs(WGS84).geometry, quantization)
+    arcs = simplify_arcs(topology.arcs, simplify)
+    geometries = []
+    for geoid, polygons, properties in zip(all_data['GEOID'], topology.objects, _properties(all_data, columns)):
+        geometry = {'id': int(geoid), 'properties': properties}
+        if not polygons:
+            geometry['type'] = None
+        elif len(polygons) == 1:
+            geometry.update(type='Polygon', arcs=polygons[0])
+        else:
+            geometry.update(type='MultiPolygon', arcs=polygons)
+        geometries.append(geometry)
+
+    bounds = np.r_[topology.translate, topology.translate + topology.scale * (quantization - 1)]
+    return {
+        'type': 'Topology',
+        'bbox': bounds.tolist(),
+        'transform': {'scale': topology.scale.tolist(), 'translate': topology.translate.tolist()},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': [np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist() for arc in arcs],
+    }
+
+def write_topojson(all_data, output_path, columns=DEFAULT_COLUMNS, quantization=100000, simplify=0.):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    topojson = to_topojson(all_data, columns, quantization, simplify)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(topojson, f, separators=(',', ':'))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def tile_bounds(z, x, y):
+    """
+    (minx, miny, maxx, maxy) of tile z/x/y in EPSG:3857 metres.
+    """
+    size = 2 * MERCATOR_HALF_WORLD / 2 ** z
+    return (-MERCATOR_HALF_WORLD + x * size, MERCATOR_HALF_WORLD - (y + 1) * size,
+            -MERCATOR_HALF_WORLD + (x + 1) * size, MERCATOR_HALF_WORLD - y * size)
+
+def write_vector_tiles(all_data, output_dir, columns=DEFAULT_COLUMNS, min_zoom=0, max_zoom=8,
+                       extent=4096, tolerance=1., buffer=64, layer='counties'):
+    """
+    Writes a z/x/y.pbf Mapbox vector tile pyramid. The borders are built once as shared arcs on
+    the max_zoom tile grid and simplified per zoom by tolerance tile units, so neighbouring
+    counties stay seamless at every zoom. Needs the optional mapbox-vector-tile package.
+    Returns the number of tiles written.
+    """
+    try:
+        import mapbox_vector_tile
+        from mapbox_vector_tile.encoder import on_invalid_geometry_make_valid
+    except ImportError:
+        raise ImportError("Vector tiles need the optional mapbox-vector-tile package: pip install mapbox-vector-tile")
+
+    output_dir = Path(output_dir)
+    mercator = all_data.to_crs(WEB_MERCATOR)
+    minx, miny, maxx, maxy = mercator.total_bounds
+    # one quantized unit is one tile unit at max_zoom
+    unit = 2 * MERCATOR_HALF_WORLD / 2 ** max_zoom / extent
+    topology = build_topology(mercator.geometry, int(np.ceil(max(maxx - minx, maxy - miny) / unit)) + 1)
+    properties = _properties(all_data, columns)
+    geoids = all_data['GEOID'].to_numpy()
+
+    written = 0
+    for z in range(min_zoom, max_zoom + 1):
+        geometry = topology_geometry(topology, simplify_arcs(topology.arcs, tolerance * 2 ** (max_zoom - z)))
+        present = np.flatnonzero(~shapely.is_missing(geometry))
+        tree = shapely.STRtree(geometry[present])
+        size = 2 * MERCATOR_HALF_WORLD / 2 ** z
+        margin = size * buffer / extent
+        xs = range(int((minx + MERCATOR_HALF_WORLD) // size), int((maxx + MERCATOR_HALF_WORLD) // size) + 1)
+        ys = range(int((MERCATOR_HALF_WORLD - maxy) // size), int((MERCATOR_HALF_WORLD - miny) // size) + 1)
+        for x in xs:
+            for y in ys:
+                bounds = tile_bounds(z, x, y)
+                hits = present[tree.query(shapely.box(*bounds).buffer(margin, join_style='mitre'))]
+                if not len(hits):
+                    continue
+                clipped = shapely.clip_by_rect(geometry[hits], bounds[0] - margin, bounds[1] - margin,
+                                               bounds[2] + margin, bounds[3] + margin)
+                # to integer tile units (y down) in one vectorized pass; the encoder's own
+                # quantize option transforms point by point in Python
+                clipped = shapely.transform(clipped, lambda c: (c - [bounds[0], bounds[3]]) * [extent / size, -extent / size])
+                clipped = shapely.set_precision(clipped, 1.)
+                features = [{'geometry': shape, 'properties': properties[i], 'id': int(geoids[i])}
+                            for shape, i in zip(clipped, hits) if not shape.is_empty]
+                if not features:
+                    continue
+                tile = mapbox_vector_tile.encode(
+                    [{'name': layer, 'features': features}],
+                    default_options={'extents': extent, 'y_coord_down': True,
+                                     'on_invalid_geometry': on_invalid_geometry_make_valid})
+                tile_path = output_dir / str(z) / str(x) / f"{y}.pbf"
+                tile_path.parent.mkdir(parents=True, exist_ok=True)
+                tile_path.write_bytes(tile)
+                written += 1
+
+    lon_lat = all_data.to_crs(WGS84).total_bounds
+    metadata = {'tilejson': '3.0.0', 'tiles': ['{z}/{x}/{y}.pbf'], 'minzoom': min_zoom, 'maxzoom': max_zoom,
+                'bounds': lon_lat.tolist(),
+                'vector_layers': [{'id': layer, 'fields': {column: 'Number' for column in columns}}]}
+    (output_dir / 'metadata.json').write_text(json.dumps(metadata, indent=2))
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the analysed counties as TopoJSON and optionally vector tiles.")
+    parser.add_argument('--parent', default=Path(__file__).resolve().parent.parent,
+                        help="repo root holding data/all_data.parquet")
+    parser.add_argument('--output-dir', help="default data/web under --parent")
+    parser.add_argument('--columns', nargs='+', default=DEFAULT_COLUMNS)
+    parser.add_argument('--quantization', type=int, default=100000)
+    parser.add_argument('--simplify', type=float, default=0., help="TopoJSON simplification in quantized units")
+    parser.add_argument('--tiles', action='store_true', help="also write a vector tile pyramid")
+    parser.add_argument('--min-zoom', type=int, default=0)
+    parser.add_argument('--max-zoom', type=int, default=8)
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir or Path(args.parent) / 'data/web')
+    all_data = read_all_data(Path(args.parent) / 'data/all_data.parquet', args.columns, geometry=True)
+    print("Data saved " + str(write_topojson(all_data, output_dir / 'counties.topojson', args.columns,
+                                             args.quantization, args.simplify)))
+    if args.tiles:
+        count = write_vector_tiles(all_data, output_dir / 'tiles', args.columns, args.min_zoom, args.max_zoom)
+        print(f"Wrote {count} tiles to {output_dir / 'tiles'}")